@@ -10,7 +10,10 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from model import ModeloAnemiaInfantil, CargadorDatos
+from cubo import CuboRiesgo
+from cache_resultados import CacheResultados
 import os
+import io
 
 # Configuración de página
 st.set_page_config(
@@ -36,23 +39,83 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Modelo compartido entre reruns y sesiones
+@st.cache_resource
+def cargar_modelo():
+    """Carga el modelo una sola vez por proceso"""
+    return ModeloAnemiaInfantil()
+
 # Función para cargar datos con caché
 @st.cache_data
 def cargar_datos_demo():
-    """Carga datos de demostración"""
+    """Carga datos de demostración junto con su huella de contenido"""
     try:
         filepath = "data/endes_muestra.csv"
         if not os.path.exists(filepath):
             st.error(f"❌ No se encontró el archivo {filepath}")
             st.info("📝 Asegúrate de que el archivo esté en la carpeta 'data/'")
-            return None
+            return None, None
         
         cargador = CargadorDatos()
         df = cargador.cargar_dataset(filepath)
-        return df
+        return df, cargador.huella_dataset(df)
     except Exception as e:
         st.error(f"❌ Error al cargar datos: {str(e)}")
-        return None
+        return None, None
+
+# Resultados y agregados del dashboard, calculados una vez por (datos, parámetros)
+@st.cache_resource(max_entries=4)
+def preparar_analisis_poblacional(_modelo, _df, huella_datos, huella_modelo):
+    """
+    Puntúa la población y precalcula métricas, distribución, análisis por quintil y casos prioritarios
+    Los argumentos con '_' no se hashean: la clave de caché son las huellas
+    Los resultados puntuados persisten en disco entre reinicios (caché compartida con el CLI)
+    """
+    df_resultado = None
+    try:
+        cache = CacheResultados()
+        clave = cache.clave(huella_datos, _modelo, origen='dataframe')
+        df_resultado = cache.obtener_dataframe(clave)
+    except (OSError, ImportError):
+        cache = None
+    
+    if df_resultado is None:
+        df_resultado = _modelo.procesar_poblacion(_df)
+        if cache is not None:
+            try:
+                cache.guardar(clave, df_resultado, {'version_modelo': _modelo.version_modelo()})
+            except (OSError, ImportError, ValueError):
+                pass  # la caché en disco es opcional
+    metricas = _modelo.generar_metricas_poblacion(df_resultado)
+    
+    distribucion = pd.DataFrame(list(metricas['distribucion_riesgo'].items()),
+                              columns=['Categoría', 'Cantidad'])
+    
+    # Cubo pre-agregado: el análisis por quintil y la exploración son roll-ups sin groupby
+    cubo = CuboRiesgo.desde_resultado(df_resultado)
+    por_quintil = cubo.consultar(por=['quintil'])
+    etiquetas_quintil = _modelo.params['mapeos']['quintil_labels']
+    analisis_quintil = pd.DataFrame({
+        'quintil_label': por_quintil['quintil'].astype(str).map(etiquetas_quintil),
+        'probabilidad_anemia': por_quintil['prevalencia_estimada'] / 100,
+        'score_riesgo': por_quintil['score_promedio']
+    })
+    
+    # Top 20 por selección parcial; la lista completa se escribe en orden sin ordenar todo
+    # Cada caso lleva los factores que más elevan su riesgo (explicaciones memoizadas)
+    casos_top = _modelo.casos_prioritarios_top(df_resultado, k=20)
+    casos_top = casos_top.assign(explicacion_riesgo=_modelo.explicar_riesgo(casos_top))
+    csv_prioritarios = io.StringIO()
+    _modelo.escribir_casos_prioritarios(df_resultado, csv_prioritarios, explicar=True)
+    
+    return {
+        'metricas': metricas,
+        'distribucion': distribucion,
+        'analisis_quintil': analisis_quintil,
+        'cubo': cubo,
+        'casos_top': casos_top,
+        'csv_prioritarios': csv_prioritarios.getvalue(),
+    }
 
 # Función principal
 def main():
@@ -74,7 +137,7 @@ def main():
     
     # Inicializar modelo
     try:
-        modelo = ModeloAnemiaInfantil()
+        modelo = cargar_modelo()
         st.sidebar.success("✅ Modelo cargado correctamente")
     except Exception as e:
         st.sidebar.error(f"❌ Error al cargar modelo: {str(e)}")
@@ -82,7 +145,7 @@ def main():
         st.stop()
     
     # Cargar datos
-    df = cargar_datos_demo()
+    df, huella_datos = cargar_datos_demo()
     if df is None:
         st.stop()
     
@@ -93,19 +156,19 @@ def main():
     )
     
     if modo_operacion == "📊 Análisis Poblacional":
-        mostrar_analisis_poblacional(modelo, df)
+        mostrar_analisis_poblacional(modelo, df, huella_datos)
     else:
         mostrar_evaluacion_individual(modelo)
 
-def mostrar_analisis_poblacional(modelo, df):
+def mostrar_analisis_poblacional(modelo, df, huella_datos):
     """Muestra análisis poblacional completo"""
     
     st.header("📊 Análisis Poblacional - Datos ENDES 2024")
     
-    # Procesamiento con spinner
+    # Procesamiento con spinner (solo la primera vez por dataset y parámetros)
     with st.spinner("🔄 Procesando análisis poblacional..."):
-        df_resultado = modelo.procesar_poblacion(df)
-        metricas = modelo.generar_metricas_poblacion(df_resultado)
+        analisis = preparar_analisis_poblacional(modelo, df, huella_datos, modelo.huella_parametros())
+        metricas = analisis['metricas']
     
     # KPIs principales
     st.subheader("🎯 Métricas Clave del Sistema")
@@ -155,11 +218,9 @@ def mostrar_analisis_poblacional(modelo, df):
         # Gráfico de distribución de riesgo
         st.subheader("📊 Distribución de Riesgo")
         
-        distribucion = pd.DataFrame(list(metricas['distribucion_riesgo'].items()), 
-                                  columns=['Categoría', 'Cantidad'])
+        distribucion = analisis['distribucion']
         
         colores = {'Alto': '#e74c3c', 'Medio': '#f39c12', 'Bajo': '#3498db', 'Muy Bajo': '#2ecc71'}
-        distribucion['Color'] = distribucion['Categoría'].map(colores)
         
         fig_pie = px.pie(
             distribucion, 
@@ -176,10 +237,7 @@ def mostrar_analisis_poblacional(modelo, df):
         # Análisis por quintil
         st.subheader("💰 Análisis por Quintil Socioeconómico")
         
-        analisis_quintil = df_resultado.groupby('quintil_label').agg({
-            'probabilidad_anemia': 'mean',
-            'score_riesgo': 'mean'
-        }).reset_index()
+        analisis_quintil = analisis['analisis_quintil']
         
         fig_bar = px.bar(
             analisis_quintil,
@@ -193,23 +251,40 @@ def mostrar_analisis_poblacional(modelo, df):
         fig_bar.update_layout(yaxis=dict(tickformat='.1%'))
         st.plotly_chart(fig_bar, use_container_width=True)
     
+    # Exploración interactiva sobre el cubo pre-agregado
+    st.subheader("🔎 Exploración Territorial")
+    
+    dimensiones = {
+        'departamento': 'Departamento', 'area_rural': 'Área rural', 'quintil': 'Quintil',
+        'grupo_edad': 'Grupo de edad', 'programa_juntos': 'Juntos', 'programa_qaliwarma': 'Qali Warma'
+    }
+    col1, col2 = st.columns(2)
+    with col1:
+        por = st.multiselect("Agrupar por", options=list(dimensiones), default=['departamento'],
+                             format_func=lambda x: dimensiones[x])
+    with col2:
+        departamentos = st.multiselect("Filtrar departamentos", options=list(range(1, 26)),
+                                       format_func=modelo.obtener_nombre_departamento)
+    
+    filtros = {'departamento': departamentos} if departamentos else None
+    exploracion = analisis['cubo'].consultar(por=por, filtros=filtros)
+    if 'departamento' in exploracion.columns:
+        exploracion['departamento'] = exploracion['departamento'].map(modelo.obtener_nombre_departamento)
+    st.dataframe(exploracion.rename(columns=dimensiones), use_container_width=True)
+    
     # Tabla de casos prioritarios
     st.subheader("🚨 Casos Prioritarios Identificados")
     
-    casos_prioritarios = df_resultado[
-        df_resultado['categoria_riesgo'].isin(['Alto', 'Medio'])
-    ].sort_values('probabilidad_anemia', ascending=False)
-    
     # Mostrar solo primeros 20 casos
     st.dataframe(
-        casos_prioritarios.head(20)[['HHID', 'quintil_label', 'area_label', 
+        analisis['casos_top'][['HHID', 'quintil_label', 'area_label', 
                                    'grupo_edad_label', 'score_riesgo', 
-                                   'categoria_riesgo', 'descripcion_riesgo']],
+                                   'categoria_riesgo', 'descripcion_riesgo', 'explicacion_riesgo']],
         use_container_width=True
     )
     
     # Botón de descarga
-    csv = casos_prioritarios.to_csv(index=False)
+    csv = analisis['csv_prioritarios']
     st.download_button(
         label="📥 Descargar Lista Completa de Casos Prioritarios",
         data=csv,
@@ -318,6 +393,12 @@ def mostrar_evaluacion_individual(modelo):
             # Recomendación
             st.info(f"💡 **Recomendación**: {descripcion}")
             
+            # Factores que más elevan el riesgo (contribución al score lineal)
+            factores = modelo.explicar_nino(datos_nino)
+            if factores:
+                st.markdown("**🔍 Principales factores de riesgo:** " +
+                            ", ".join(f"{factor} ({contribucion:+.2f})" for factor, contribucion in factores))
+            
             # Gráfico de gauge
             fig_gauge = go.Figure(go.Indicator(
                 mode = "gauge+number+delta",
@@ -0,0 +1,290 @@
+"""
+Benchmark del Motor Predictivo - Sistema de Anemia Infantil
+Mide throughput, percentiles de latencia y memoria pico por etapa sobre poblaciones sintéticas
+
+Uso:
+    python benchmark.py --tamanos 1000 100000 1000000 --salida bench.json
+    python benchmark.py --tamanos 10000000 --repeticiones 3
+    python benchmark.py --salida actual.json --baseline bench.json --tolerancia 0.2
+    python benchmark.py --tamanos --arranques 50    # solo arranque en frío
+    python benchmark.py --tamanos 2000000 --workers 1 4 8 16    # aceleración de ProcesadorParalelo
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model import ModeloAnemiaInfantil
+from paralelo import ProcesadorParalelo
+
+MUESTRA_ENDES = "data/endes_muestra.csv"
+
+# Proceso nuevo que importa model.py, carga el modelo y puntúa un niño; reporta tiempos internos
+CODIGO_ARRANQUE = """
+import json, sys, time
+inicio = time.perf_counter()
+from model import ModeloAnemiaInfantil
+importado = time.perf_counter()
+modelo = ModeloAnemiaInfantil(sys.argv[1])
+cargado = time.perf_counter()
+modelo.predecir_probabilidad({'quintil': 1, 'area_rural': 1, 'grupo_edad': 0, 'departamento': 16,
+                              'programa_juntos': 1, 'programa_qaliwarma': 0})
+fin = time.perf_counter()
+print(json.dumps({'importar': importado - inicio, 'cargar_modelo': cargado - importado,
+                  'predecir': fin - cargado, 'pandas_importado': 'pandas' in sys.modules}))
+"""
+
+
+def generar_poblacion(n: int, semilla: int = 42, muestra_path: str = MUESTRA_ENDES) -> pd.DataFrame:
+    """
+    Genera una población sintética con el esquema de endes_muestra.csv
+    Remuestrea filas completas (conserva la distribución conjunta) y asigna HHID únicos
+    """
+    muestra = pd.read_csv(muestra_path)
+    rng = np.random.default_rng(semilla)
+    poblacion = muestra.iloc[rng.integers(0, len(muestra), size=n)].reset_index(drop=True)
+    poblacion['HHID'] = 'HH_' + pd.Series(np.arange(n)).astype(str).str.zfill(9)
+    return poblacion
+
+
+def _percentiles_ms(duraciones: List[float]) -> Dict:
+    """Percentiles de latencia en milisegundos"""
+    p50, p95, p99 = np.percentile(np.array(duraciones) * 1000, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+
+def _memoria_pico_mb(funcion: Callable) -> float:
+    """Memoria pico asignada (Python + NumPy/pandas) durante una ejecución"""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def medir_etapa(etapa: str, funcion: Callable, filas: int, repeticiones: int) -> Dict:
+    """
+    Ejecuta una etapa varias veces: tiempos sin tracemalloc y una corrida aparte para memoria
+    """
+    funcion()  # calentamiento
+    duraciones = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - inicio)
+
+    mediana = float(np.median(duraciones))
+    return {
+        'etapa': etapa,
+        'filas': filas,
+        'repeticiones': repeticiones,
+        'throughput_filas_s': filas / mediana if mediana > 0 else float('inf'),
+        'latencia_ms': _percentiles_ms(duraciones),
+        'memoria_pico_mb': _memoria_pico_mb(funcion),
+    }
+
+
+def medir_individual(modelo: ModeloAnemiaInfantil, poblacion: pd.DataFrame, n_llamadas: int) -> Dict:
+    """Latencia por niño de predecir_probabilidad, recorriendo registros de la población"""
+    registros = poblacion[modelo.params['variables_requeridas']].head(n_llamadas).to_dict('records')
+    registros = (registros * (n_llamadas // len(registros) + 1))[:n_llamadas]
+    for datos_nino in registros[:100]:
+        modelo.predecir_probabilidad(datos_nino)  # calentamiento
+
+    duraciones = []
+    for datos_nino in registros:
+        inicio = time.perf_counter()
+        modelo.predecir_probabilidad(datos_nino)
+        duraciones.append(time.perf_counter() - inicio)
+
+    total = sum(duraciones)
+    return {
+        'etapa': 'predecir_probabilidad',
+        'filas': len(registros),
+        'repeticiones': 1,
+        'throughput_filas_s': len(registros) / total if total > 0 else float('inf'),
+        'latencia_ms': _percentiles_ms(duraciones),
+        'memoria_pico_mb': _memoria_pico_mb(lambda: [modelo.predecir_probabilidad(d) for d in registros[:1000]]),
+    }
+
+
+def medir_arranque(modelo_path: str, n_procesos: int) -> Dict:
+    """
+    Arranque en frío: lanza procesos nuevos que importan model.py y puntúan un solo niño
+    La latencia es el tiempo total del proceso (intérprete incluido) visto desde afuera
+    """
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [directorio, os.environ.get('PYTHONPATH')])))
+
+    duraciones = []
+    internos = []
+    for _ in range(n_procesos):
+        inicio = time.perf_counter()
+        salida = subprocess.run([sys.executable, '-c', CODIGO_ARRANQUE, modelo_path], env=entorno,
+                                capture_output=True, text=True, check=True).stdout
+        duraciones.append(time.perf_counter() - inicio)
+        internos.append(json.loads(salida.strip().splitlines()[-1]))
+
+    total = sum(duraciones)
+    return {
+        'etapa': 'arranque_en_frio',
+        'filas': n_procesos,
+        'repeticiones': n_procesos,
+        'throughput_filas_s': n_procesos / total if total > 0 else float('inf'),
+        'latencia_ms': _percentiles_ms(duraciones),
+        'memoria_pico_mb': None,
+        'desglose_ms': {
+            etapa: float(np.median([interno[etapa] for interno in internos]) * 1000)
+            for etapa in ('importar', 'cargar_modelo', 'predecir')
+        },
+        'pandas_importado': any(interno['pandas_importado'] for interno in internos),
+        'tamano_poblacion': 1,
+    }
+
+
+def ejecutar_benchmark(tamanos: List[int], repeticiones: int = 5, semilla: int = 42,
+                       modelo_path: str = "modelo_params.json", arranques: int = 0,
+                       workers: Optional[List[int]] = None) -> Dict:
+    """
+    Corre todas las etapas para cada tamaño de población y, opcionalmente, el arranque en frío
+    Con workers, mide ProcesadorParalelo.procesar para cada número de procesos (pool ya iniciado)
+    """
+    modelo = ModeloAnemiaInfantil(modelo_path)
+    resultados = []
+    procesadores = [ProcesadorParalelo(n, modelo_path) for n in workers or []]
+
+    if arranques:
+        # El modelo ya cargado dejó lista la tabla compilada que usan los procesos nuevos
+        print(f"⏱️ Arranque en frío ({arranques} procesos)")
+        resultados.append(medir_arranque(modelo_path, arranques))
+
+    for n in tamanos:
+        print(f"⏱️ Población sintética de {n:,} niños")
+        poblacion = generar_poblacion(n, semilla)
+        df_resultado = modelo.procesar_poblacion(poblacion)
+        lote = poblacion[modelo.params['variables_requeridas']].head(1000).to_dict('records')
+
+        etapas = [
+            ('_crear_variables_derivadas', lambda: modelo._crear_variables_derivadas(poblacion), n),
+            ('procesar_poblacion', lambda: modelo.procesar_poblacion(poblacion), n),
+            ('generar_metricas_poblacion', lambda: modelo.generar_metricas_poblacion(df_resultado), n),
+            ('predecir_lote', lambda: modelo.predecir_lote(lote), len(lote)),
+        ]
+        etapas += [
+            (f'procesar_paralelo_{procesador.n_workers}w', lambda p=procesador: p.procesar(poblacion), n)
+            for procesador in procesadores
+        ]
+        for etapa, funcion, filas in etapas:
+            resultado = medir_etapa(etapa, funcion, filas, repeticiones)
+            resultado['tamano_poblacion'] = n
+            resultados.append(resultado)
+
+        resultado = medir_individual(modelo, poblacion, 10_000)
+        resultado['tamano_poblacion'] = n
+        resultados.append(resultado)
+
+        del poblacion, df_resultado
+
+    for procesador in procesadores:
+        procesador.cerrar()
+
+    return {
+        'metadata': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+            'procesador': platform.processor(),
+            'nucleos': os.cpu_count(),
+            'semilla': semilla,
+            'repeticiones': repeticiones,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar_con_baseline(actual: Dict, baseline: Dict, tolerancia: float = 0.2) -> List[Dict]:
+    """
+    Compara throughput por (etapa, tamaño); marca regresión si cae más que la tolerancia
+    """
+    previos = {(r['etapa'], r['tamano_poblacion']): r for r in baseline['resultados']}
+    comparacion = []
+    for r in actual['resultados']:
+        previo = previos.get((r['etapa'], r['tamano_poblacion']))
+        if previo is None:
+            continue
+        razon = r['throughput_filas_s'] / previo['throughput_filas_s']
+        comparacion.append({
+            'etapa': r['etapa'],
+            'tamano_poblacion': r['tamano_poblacion'],
+            'razon_throughput': razon,
+            'regresion': razon < 1 - tolerancia,
+        })
+    return comparacion
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de etapas del modelo de anemia infantil")
+    parser.add_argument('--tamanos', type=int, nargs='*', default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="Tamaños de población sintética (hasta 10,000,000)")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--modelo', default='modelo_params.json')
+    parser.add_argument('--arranques', type=int, default=20,
+                        help="Procesos nuevos para medir el arranque en frío (0 lo omite)")
+    parser.add_argument('--workers', type=int, nargs='*', default=[],
+                        help="Números de procesos para medir ProcesadorParalelo (p.ej. 1 4 8)")
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--baseline', help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Caída relativa de throughput considerada regresión")
+    args = parser.parse_args(argv)
+
+    reporte = ejecutar_benchmark(args.tamanos, args.repeticiones, args.semilla, args.modelo, args.arranques,
+                                 args.workers)
+
+    for r in reporte['resultados']:
+        if r['etapa'] == 'arranque_en_frio':
+            desglose = "  ".join(f"{etapa}={ms:.2f} ms" for etapa, ms in r['desglose_ms'].items())
+            print(f"{r['etapa']:<28} procesos={r['filas']:>4}  "
+                  f"p50={r['latencia_ms']['p50']:.1f} ms  p95={r['latencia_ms']['p95']:.1f} ms  "
+                  f"({desglose}; pandas importado: {r['pandas_importado']})")
+            continue
+        print(f"{r['etapa']:<28} n={r['tamano_poblacion']:>10,}  "
+              f"{r['throughput_filas_s']:>14,.0f} filas/s  "
+              f"p50={r['latencia_ms']['p50']:.4f} ms  p99={r['latencia_ms']['p99']:.4f} ms  "
+              f"pico={r['memoria_pico_mb']:.1f} MB")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"✅ Resultados guardados en {args.salida}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            comparacion = comparar_con_baseline(reporte, json.load(f), args.tolerancia)
+        regresiones = [c for c in comparacion if c['regresion']]
+        for c in comparacion:
+            marca = "⚠️" if c['regresion'] else "✅"
+            print(f"{marca} {c['etapa']:<28} n={c['tamano_poblacion']:>10,}  x{c['razon_throughput']:.2f}")
+        if regresiones:
+            print(f"⚠️ {len(regresiones)} regresiones de rendimiento frente al baseline")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
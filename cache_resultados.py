@@ -0,0 +1,224 @@
+"""
+Caché Persistente de Resultados - Sistema de Anemia Infantil
+Resultados puntuados y métricas en disco, direccionados por huella de datos y de modelo
+
+Cada entrada es un directorio inmutable <clave>/ con:
+    resultado.feather  resultados en Arrow IPC sin compresión (se leen por memory-map)
+    metadatos.json     métricas y resumen del cálculo (su mtime es el último acceso, para LRU)
+    (otros archivos que el llamador agregue, p.ej. la cuarentena del CLI)
+
+Concurrencia: las entradas se escriben en un directorio temporal y se publican con os.replace;
+se borran renombrándolas antes de eliminarlas, así un lector ve la entrada completa o no la ve.
+El desalojo por tamaño (LRU) se serializa entre procesos con un bloqueo de archivo.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos para el desalojo
+    fcntl = None
+
+from model import ModeloAnemiaInfantil
+
+ARCHIVO_RESULTADO = 'resultado.feather'
+ARCHIVO_METADATOS = 'metadatos.json'
+
+# Versión del formato de las entradas: cambiarla invalida la caché completa
+FORMATO_CACHE = 1
+
+
+class CacheResultados:
+    """
+    Caché de resultados en disco compartida entre procesos (app, CLI, workers)
+    Las claves combinan la huella del contenido de entrada con la del modelo y el código
+    """
+
+    def __init__(self, directorio: str = ".cache_resultados", max_bytes: int = 2 * 1024 ** 3):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        os.makedirs(directorio, exist_ok=True)
+
+    @staticmethod
+    def huella_archivo(ruta: str, tamano_bloque: int = 1 << 20) -> str:
+        """SHA-256 del contenido de un archivo (lectura por bloques)"""
+        huella = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(tamano_bloque), b''):
+                huella.update(bloque)
+        return huella.hexdigest()
+
+    @staticmethod
+    def clave(huella_datos: str, modelo: ModeloAnemiaInfantil, **opciones) -> str:
+        """
+        Clave de una entrada: datos, parámetros y código del modelo, y opciones que cambian el resultado
+        """
+        contenido = json.dumps({
+            'formato': FORMATO_CACHE,
+            'datos': huella_datos,
+            'modelo': modelo._clave_compilada() or modelo.huella_parametros(),
+            'opciones': opciones,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def ruta(self, clave: str) -> str:
+        """Directorio de la entrada"""
+        return os.path.join(self.directorio, clave)
+
+    def obtener(self, clave: str) -> Optional[Dict]:
+        """
+        Entrada publicada o None
+        Retorna: {'ruta', 'metadatos', 'tabla'} con 'tabla' como pyarrow.Table sobre memory-map
+        (None si la entrada no tiene filas)
+        """
+        ruta = self.ruta(clave)
+        ruta_metadatos = os.path.join(ruta, ARCHIVO_METADATOS)
+        try:
+            with open(ruta_metadatos, 'r', encoding='utf-8') as f:
+                metadatos = json.load(f)
+            tabla = None
+            ruta_resultado = os.path.join(ruta, ARCHIVO_RESULTADO)
+            if os.path.exists(ruta_resultado):
+                import pyarrow as pa
+                # Sin copia: los buffers de la tabla apuntan al archivo mapeado
+                tabla = pa.ipc.open_file(pa.memory_map(ruta_resultado, 'r')).read_all()
+        except (OSError, ValueError):
+            # Entrada inexistente, desalojada durante la lectura o dañada: es un fallo de caché
+            return None
+
+        # Último acceso para el desalojo LRU (sin efecto en directorios de solo lectura)
+        try:
+            os.utime(ruta_metadatos)
+        except OSError:
+            pass
+        return {'ruta': ruta, 'metadatos': metadatos, 'tabla': tabla}
+
+    def obtener_dataframe(self, clave: str) -> Optional[pd.DataFrame]:
+        """Resultados de la entrada como DataFrame (tipos e índice originales), o None"""
+        entrada = self.obtener(clave)
+        if entrada is None or entrada['tabla'] is None:
+            return None
+        return entrada['tabla'].to_pandas()
+
+    @contextmanager
+    def escribir(self, clave: str) -> Iterator[str]:
+        """
+        Directorio temporal donde el llamador escribe la entrada; al salir sin error se publica
+        atómicamente y se aplica el desalojo. Solo se publica si el llamador escribió metadatos.json:
+        sin él la entrada se descarta. Si otro proceso publicó la misma clave antes, se conserva la suya
+        """
+        temporal = tempfile.mkdtemp(prefix='.tmp-', dir=self.directorio)
+        try:
+            yield temporal
+            if not os.path.exists(os.path.join(temporal, ARCHIVO_METADATOS)):
+                return
+            try:
+                os.replace(temporal, self.ruta(clave))
+            except OSError:
+                if not os.path.isdir(self.ruta(clave)):
+                    raise
+        finally:
+            if os.path.isdir(temporal):
+                shutil.rmtree(temporal, ignore_errors=True)
+        self.desalojar(conservar=clave)
+
+    def guardar(self, clave: str, df_resultado: pd.DataFrame, metadatos: Optional[Dict] = None):
+        """Guarda un DataFrame de resultados y sus metadatos como entrada"""
+        import pyarrow as pa
+        with self.escribir(clave) as temporal:
+            if len(df_resultado):
+                tabla = pa.Table.from_pandas(df_resultado)
+                with pa.OSFile(os.path.join(temporal, ARCHIVO_RESULTADO), 'wb') as destino:
+                    with pa.ipc.new_file(destino, tabla.schema) as escritor:
+                        escritor.write_table(tabla)
+            escribir_metadatos(temporal, metadatos or {})
+
+    @contextmanager
+    def _bloqueo(self):
+        """Bloqueo exclusivo entre procesos para el desalojo"""
+        with open(os.path.join(self.directorio, '.bloqueo'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _eliminar(self, ruta: str):
+        """Retira una entrada renombrándola primero, para que ningún lector la vea a medias"""
+        retirada = os.path.join(self.directorio, f".borrar-{uuid.uuid4().hex}")
+        try:
+            os.replace(ruta, retirada)
+        except OSError:
+            return
+        shutil.rmtree(retirada, ignore_errors=True)
+
+    def entradas(self) -> Dict[str, Dict]:
+        """Entradas publicadas: {clave: {'bytes', 'ultimo_acceso'}}"""
+        entradas = {}
+        for nombre in os.listdir(self.directorio):
+            ruta = self.ruta(nombre)
+            if nombre.startswith('.') or not os.path.isdir(ruta):
+                continue
+            try:
+                ultimo_acceso = os.stat(os.path.join(ruta, ARCHIVO_METADATOS)).st_mtime
+                tamano = sum(os.stat(os.path.join(ruta, archivo)).st_size for archivo in os.listdir(ruta))
+            except OSError:
+                continue  # desalojada mientras se listaba
+            entradas[nombre] = {'bytes': tamano, 'ultimo_acceso': ultimo_acceso}
+        return entradas
+
+    def tamano_total(self) -> int:
+        """Bytes ocupados por las entradas publicadas"""
+        return sum(entrada['bytes'] for entrada in self.entradas().values())
+
+    def desalojar(self, conservar: Optional[str] = None) -> int:
+        """
+        Elimina las entradas menos usadas hasta quedar bajo max_bytes; retorna cuántas eliminó
+        También limpia temporales abandonados (más de una hora) por escritores interrumpidos
+        """
+        eliminadas = 0
+        with self._bloqueo():
+            for nombre in os.listdir(self.directorio):
+                ruta = self.ruta(nombre)
+                if nombre.startswith('.tmp-') or nombre.startswith('.borrar-'):
+                    try:
+                        if time.time() - os.stat(ruta).st_mtime > 3600:
+                            shutil.rmtree(ruta, ignore_errors=True)
+                    except OSError:
+                        pass
+
+            entradas = self.entradas()
+            total = sum(entrada['bytes'] for entrada in entradas.values())
+            for clave, entrada in sorted(entradas.items(), key=lambda e: e[1]['ultimo_acceso']):
+                if total <= self.max_bytes:
+                    break
+                if clave == conservar:
+                    continue
+                self._eliminar(self.ruta(clave))
+                total -= entrada['bytes']
+                eliminadas += 1
+        return eliminadas
+
+    def limpiar(self):
+        """Elimina todas las entradas"""
+        with self._bloqueo():
+            for clave in self.entradas():
+                self._eliminar(self.ruta(clave))
+
+
+def escribir_metadatos(directorio: str, metadatos: Dict):
+    """Escribe metadatos.json de una entrada en construcción"""
+    with open(os.path.join(directorio, ARCHIVO_METADATOS), 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, ensure_ascii=False, default=str)
@@ -0,0 +1,149 @@
+"""
+Cubo de Riesgo Pre-agregado - Sistema de Anemia Infantil
+Agregados por departamento × área × quintil × grupo de edad × programas para drill-down rápido
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+from model import ModeloAnemiaInfantil, AcumuladorMetricas, CATEGORIAS
+
+# Dimensiones del cubo: (variable, mínimo, máximo), mismo espacio discreto que el modelo
+DIMENSIONES = ModeloAnemiaInfantil.DOMINIO_VARIABLES
+
+
+class CuboRiesgo:
+    """
+    Conteos, sumas de probabilidad/score y conteos por categoría en cada celda del dominio discreto
+    Se construye en una pasada, admite roll-up/slice y cubos parciales combinables
+    """
+
+    def __init__(self):
+        forma = tuple(maximo - minimo + 1 for _, minimo, maximo in DIMENSIONES)
+        self.conteo = np.zeros(forma, dtype=np.int64)
+        self.suma_probabilidad = np.zeros(forma, dtype=np.float64)
+        self.suma_score = np.zeros(forma, dtype=np.float64)
+        self.conteo_categoria = np.zeros((len(CATEGORIAS),) + forma, dtype=np.int64)
+        self.n_fuera_dominio = 0
+
+    @classmethod
+    def desde_resultado(cls, df_resultado: pd.DataFrame) -> 'CuboRiesgo':
+        """Construye el cubo a partir de la salida de procesar_poblacion"""
+        cubo = cls()
+        cubo.agregar(df_resultado)
+        return cubo
+
+    def agregar(self, df_resultado: pd.DataFrame):
+        """Acumula un bloque de resultados (una sola pasada con bincount)"""
+        forma = self.conteo.shape
+        celdas = int(np.prod(forma))
+
+        indices = np.zeros(len(df_resultado), dtype=np.int64)
+        en_dominio = np.ones(len(df_resultado), dtype=bool)
+        for (variable, minimo, maximo), tamano in zip(DIMENSIONES, forma):
+            valores = df_resultado[variable].to_numpy()
+            desplazamiento = valores - minimo
+            en_dominio &= (desplazamiento >= 0) & (desplazamiento < tamano)
+            if valores.dtype.kind == 'f':
+                en_dominio &= valores == np.floor(valores)
+            indices = indices * tamano + np.where(en_dominio, desplazamiento, 0).astype(np.int64)
+
+        # Filas fuera del dominio discreto no tienen celda en el cubo
+        self.n_fuera_dominio += int((~en_dominio).sum())
+        indices = indices[en_dominio]
+        probabilidades = df_resultado['probabilidad_anemia'].to_numpy(dtype=float)[en_dominio]
+        scores = df_resultado['score_riesgo'].to_numpy(dtype=float)[en_dominio]
+        codigos = pd.Categorical(df_resultado['categoria_riesgo'], categories=CATEGORIAS).codes[en_dominio]
+
+        self.conteo += np.bincount(indices, minlength=celdas).reshape(forma)
+        self.suma_probabilidad += np.bincount(indices, weights=probabilidades, minlength=celdas).reshape(forma)
+        self.suma_score += np.bincount(indices, weights=scores, minlength=celdas).reshape(forma)
+
+        con_categoria = codigos >= 0
+        self.conteo_categoria += np.bincount(
+            codigos[con_categoria].astype(np.int64) * celdas + indices[con_categoria],
+            minlength=len(CATEGORIAS) * celdas
+        ).reshape(self.conteo_categoria.shape)
+
+    def combinar(self, otro: 'CuboRiesgo') -> 'CuboRiesgo':
+        """Suma un cubo parcial (por ejemplo, de otro shard o archivo)"""
+        self.conteo += otro.conteo
+        self.suma_probabilidad += otro.suma_probabilidad
+        self.suma_score += otro.suma_score
+        self.conteo_categoria += otro.conteo_categoria
+        self.n_fuera_dominio += otro.n_fuera_dominio
+        return self
+
+    def _rebanada(self, filtros: Optional[Dict[str, Union[int, List[int]]]]) -> tuple:
+        """Selector por eje para los valores filtrados de cada dimensión"""
+        filtros = filtros or {}
+        desconocidas = set(filtros) - {variable for variable, _, _ in DIMENSIONES}
+        if desconocidas:
+            raise ValueError(f"Dimensiones desconocidas: {desconocidas}")
+
+        selector = []
+        for variable, minimo, maximo in DIMENSIONES:
+            if variable in filtros:
+                valores = np.atleast_1d(filtros[variable]).astype(np.int64)
+                valores = valores[(valores >= minimo) & (valores <= maximo)]
+                selector.append(valores - minimo)
+            else:
+                selector.append(np.arange(maximo - minimo + 1))
+        return np.ix_(*selector)
+
+    def consultar(self, por: Optional[List[str]] = None,
+                  filtros: Optional[Dict[str, Union[int, List[int]]]] = None) -> pd.DataFrame:
+        """
+        Roll-up por las dimensiones en 'por' dentro de la rebanada definida por 'filtros'
+        Ej: consultar(por=['departamento'], filtros={'area_rural': 1, 'quintil': [1, 2]})
+        """
+        por = por or []
+        nombres = [variable for variable, _, _ in DIMENSIONES]
+        desconocidas = set(por) - set(nombres)
+        if desconocidas:
+            raise ValueError(f"Dimensiones desconocidas: {desconocidas}")
+
+        rebanada = self._rebanada(filtros)
+        ejes_suma = tuple(i for i, variable in enumerate(nombres) if variable not in por)
+
+        # Tras sumar, los ejes restantes quedan en el orden de DIMENSIONES; se reordenan según 'por'
+        ejes_por = sorted(nombres.index(variable) for variable in por)
+        permutacion = [ejes_por.index(nombres.index(variable)) for variable in por]
+        reducir = lambda arreglo: arreglo[rebanada].sum(axis=ejes_suma).transpose(permutacion)
+
+        conteo = reducir(self.conteo)
+        suma_probabilidad = reducir(self.suma_probabilidad)
+        suma_score = reducir(self.suma_score)
+        por_categoria = [reducir(self.conteo_categoria[i]) for i in range(len(CATEGORIAS))]
+
+        # Coordenadas de cada celda resultante, en el orden de 'por'
+        coordenadas = [rebanada[nombres.index(variable)].ravel() + DIMENSIONES[nombres.index(variable)][1]
+                       for variable in por]
+        rejilla = np.meshgrid(*coordenadas, indexing='ij')
+        resultado = pd.DataFrame({variable: eje.ravel() for variable, eje in zip(por, rejilla)})
+
+        total = conteo.ravel()
+        alto, medio = por_categoria[0].ravel(), por_categoria[1].ravel()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado['total_ninos'] = total
+            resultado['prevalencia_estimada'] = suma_probabilidad.ravel() / total * 100
+            resultado['score_promedio'] = suma_score.ravel() / total
+            resultado['ninos_alto_riesgo'] = alto
+            resultado['ninos_medio_riesgo'] = medio
+            resultado['ninos_prioritarios'] = alto + medio
+            resultado['porcentaje_focalizacion'] = (alto + medio) / total * 100
+
+        return resultado[resultado['total_ninos'] > 0].reset_index(drop=True)
+
+    def metricas(self, filtros: Optional[Dict[str, Union[int, List[int]]]] = None) -> Dict:
+        """Métricas con el formato de generar_metricas_poblacion para una rebanada del cubo"""
+        rebanada = self._rebanada(filtros)
+        acumulador = AcumuladorMetricas()
+        acumulador.total_ninos = int(self.conteo[rebanada].sum())
+        acumulador.suma_probabilidad = float(self.suma_probabilidad[rebanada].sum())
+        acumulador.n_probabilidad = acumulador.total_ninos
+        acumulador.conteos_riesgo = {
+            categoria: int(self.conteo_categoria[i][rebanada].sum()) for i, categoria in enumerate(CATEGORIAS)
+        }
+        return acumulador.metricas()
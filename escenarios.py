@@ -0,0 +1,185 @@
+"""
+Simulación de Escenarios (What-if) - Sistema de Anemia Infantil
+Evalúa intervenciones declarativas de cobertura contra una línea base ya puntuada
+
+Ejemplo:
+    escenarios = [
+        {'nombre': 'Juntos para Q1 rural en Puno',
+         'intervenciones': [{'filtros': {'departamento': 21, 'quintil': 1, 'area_rural': 1},
+                             'cambios': {'programa_juntos': 1}}]},
+        {'nombre': 'Qali Warma al 50% en Q1-Q2',
+         'intervenciones': [{'filtros': {'quintil': [1, 2]}, 'cambios': {'programa_qaliwarma': 1},
+                             'cobertura': 0.5}]},
+    ]
+    motor = MotorEscenarios(modelo, df_resultado)
+    resumen, por_departamento = motor.evaluar(escenarios)
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+from model import ModeloAnemiaInfantil, CATEGORIAS, metricas_vectorizadas
+
+# Métricas de generar_metricas_poblacion que se comparan entre escenarios
+METRICAS_ESCENARIO = [
+    'total_ninos', 'prevalencia_estimada', 'ninos_alto_riesgo', 'ninos_medio_riesgo',
+    'ninos_prioritarios', 'porcentaje_focalizacion', 'casos_prevenibles_estimados',
+]
+
+
+class MotorEscenarios:
+    """
+    Línea base puntuada una sola vez; cada escenario recalcula solo las filas que modifica
+    y actualiza por deltas los agregados por departamento
+    """
+
+    def __init__(self, modelo: ModeloAnemiaInfantil, df_resultado: pd.DataFrame):
+        """df_resultado: salida de procesar_poblacion (línea base)"""
+        self.modelo = modelo
+        self.df_resultado = df_resultado
+        self._columnas = {}
+
+        # Grupos por departamento (incluye códigos fuera del rango 1-25)
+        self.codigos_departamento, self.departamentos = pd.factorize(df_resultado['departamento'], sort=True)
+        self.n_grupos = len(self.departamentos)
+
+        self.probabilidades = df_resultado['probabilidad_anemia'].to_numpy(dtype=float)
+        self.codigos_riesgo = pd.Categorical(df_resultado['categoria_riesgo'], categories=CATEGORIAS).codes
+
+        self.base = self._agregados(self.codigos_departamento, self.probabilidades, self.codigos_riesgo, signo=1)
+
+    def _columna(self, columna: str) -> np.ndarray:
+        """Valores de una columna de la línea base (se extraen una sola vez)"""
+        if columna not in self._columnas:
+            if columna not in self.df_resultado.columns:
+                raise ValueError(f"Columna desconocida en el escenario: {columna}")
+            self._columnas[columna] = self.df_resultado[columna].to_numpy()
+        return self._columnas[columna]
+
+    def _agregados(self, grupos: np.ndarray, probabilidades: np.ndarray, codigos: np.ndarray,
+                   signo: int) -> Dict[str, np.ndarray]:
+        """Conteo, suma de probabilidad y conteo por categoría de cada departamento"""
+        validas = ~np.isnan(probabilidades)
+        con_categoria = codigos >= 0
+        return {
+            'conteo': signo * np.bincount(grupos, minlength=self.n_grupos),
+            'suma_probabilidad': signo * np.bincount(grupos[validas], weights=probabilidades[validas],
+                                                     minlength=self.n_grupos),
+            'n_probabilidad': signo * np.bincount(grupos[validas], minlength=self.n_grupos),
+            'por_categoria': signo * np.bincount(
+                grupos[con_categoria] * len(CATEGORIAS) + codigos[con_categoria],
+                minlength=self.n_grupos * len(CATEGORIAS)
+            ).reshape(self.n_grupos, len(CATEGORIAS)),
+        }
+
+    def _filtro(self, filtros: Dict, actuales: Dict[str, np.ndarray]) -> np.ndarray:
+        """Filas que cumplen todos los filtros (valor o lista de valores) sobre los valores actuales"""
+        mascara = np.ones(len(self.df_resultado), dtype=bool)
+        for columna, valor in filtros.items():
+            valores = actuales.get(columna)
+            if valores is None:
+                valores = self._columna(columna)
+            if isinstance(valor, (list, tuple, set)):
+                mascara &= np.isin(valores, list(valor))
+            else:
+                mascara &= valores == valor
+        return mascara
+
+    def _aplicar(self, escenario: Dict) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Aplica en orden las intervenciones del escenario
+        Retorna: (filas afectadas, columnas modificadas completas)
+        """
+        intervenciones = escenario.get('intervenciones')
+        if intervenciones is None:
+            intervenciones = [{clave: escenario[clave] for clave in ('filtros', 'cambios', 'cobertura', 'semilla')
+                               if clave in escenario}]
+
+        afectadas = np.zeros(len(self.df_resultado), dtype=bool)
+        actuales = {}
+        for intervencion in intervenciones:
+            mascara = self._filtro(intervencion.get('filtros', {}), actuales)
+
+            # Cobertura parcial: subconjunto aleatorio reproducible de las filas elegibles
+            cobertura = intervencion.get('cobertura', 1.0)
+            if cobertura < 1.0:
+                elegibles = np.flatnonzero(mascara)
+                rng = np.random.default_rng(intervencion.get('semilla', 42))
+                mascara = np.zeros_like(mascara)
+                mascara[elegibles[rng.random(len(elegibles)) < cobertura]] = True
+
+            for columna, valor in intervencion['cambios'].items():
+                if columna == 'departamento':
+                    raise ValueError("Un escenario no puede cambiar el departamento de las filas")
+                if columna not in actuales:
+                    actuales[columna] = self._columna(columna).copy()
+                actuales[columna][mascara] = valor
+            afectadas |= mascara
+
+        return afectadas, actuales
+
+    def _evaluar_escenario(self, escenario: Dict) -> Tuple[Dict[str, np.ndarray], np.ndarray, int]:
+        """
+        Agregados por departamento del escenario, filas afectadas por departamento
+        y número de filas que cambian de categoría; solo las filas afectadas se vuelven a puntuar
+        """
+        afectadas, actuales = self._aplicar(escenario)
+        posiciones = np.flatnonzero(afectadas)
+
+        # Variables que usa el modelo, con los valores modificados del escenario
+        variables = [variable for variable, _, _ in self.modelo.DOMINIO_VARIABLES]
+        variables += [variable for variable in self.modelo.coeficientes
+                      if variable not in variables and variable in self.df_resultado.columns]
+        df_afectadas = pd.DataFrame({
+            variable: (actuales[variable] if variable in actuales else self._columna(variable))[posiciones]
+            for variable in variables
+        })
+        probabilidades, _, codigos = self.modelo._puntuar(df_afectadas)
+
+        grupos = self.codigos_departamento[posiciones]
+        salientes = self._agregados(grupos, self.probabilidades[posiciones], self.codigos_riesgo[posiciones], -1)
+        entrantes = self._agregados(grupos, probabilidades, codigos.astype(np.int64), 1)
+        agregados = {clave: self.base[clave] + salientes[clave] + entrantes[clave] for clave in self.base}
+
+        cambios_riesgo = int(np.count_nonzero(codigos != self.codigos_riesgo[posiciones]))
+        return agregados, np.bincount(grupos, minlength=self.n_grupos), cambios_riesgo
+
+    def evaluar(self, escenarios: List[Dict], solo_afectados: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Evalúa varios escenarios contra la misma línea base
+        Retorna: (resumen por escenario, detalle por escenario y departamento) con métricas y deltas
+        En el detalle, solo_afectados deja los departamentos con alguna fila modificada
+        """
+        metricas_base_dept = metricas_vectorizadas(**self.base)
+        metricas_base = metricas_vectorizadas(**{clave: valor.sum(axis=0) for clave, valor in self.base.items()})
+        nombres = [self.modelo.obtener_nombre_departamento(d) for d in self.departamentos]
+
+        resumen = [dict({'escenario': 'Línea base', 'ninos_afectados': 0, 'ninos_cambian_categoria': 0},
+                        **{metrica: metricas_base[metrica] for metrica in METRICAS_ESCENARIO},
+                        **{f'delta_{metrica}': 0 for metrica in METRICAS_ESCENARIO})]
+        detalle = []
+
+        for i, escenario in enumerate(escenarios):
+            nombre = escenario.get('nombre', f'Escenario {i + 1}')
+            agregados, afectados_dept, cambios = self._evaluar_escenario(escenario)
+            afectados = int(afectados_dept.sum())
+
+            metricas = metricas_vectorizadas(**{clave: valor.sum(axis=0) for clave, valor in agregados.items()})
+            resumen.append(dict({'escenario': nombre, 'ninos_afectados': afectados, 'ninos_cambian_categoria': cambios},
+                                **{metrica: metricas[metrica] for metrica in METRICAS_ESCENARIO},
+                                **{f'delta_{metrica}': metricas[metrica] - metricas_base[metrica]
+                                   for metrica in METRICAS_ESCENARIO}))
+
+            metricas_dept = metricas_vectorizadas(**agregados)
+            filas = pd.DataFrame({'escenario': nombre, 'departamento': self.departamentos,
+                                  'departamento_nombre': nombres, 'ninos_afectados': afectados_dept})
+            for metrica in METRICAS_ESCENARIO:
+                filas[metrica] = metricas_dept[metrica]
+                filas[f'delta_{metrica}'] = metricas_dept[metrica] - metricas_base_dept[metrica]
+            if solo_afectados:
+                filas = filas[afectados_dept > 0]
+            detalle.append(filas)
+
+        por_departamento = pd.concat(detalle, ignore_index=True) if detalle else pd.DataFrame()
+        return pd.DataFrame(resumen), por_departamento
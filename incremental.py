@@ -0,0 +1,135 @@
+"""
+Re-scoring Incremental - Sistema de Anemia Infantil
+Mantiene resultados previos por HHID y solo vuelve a puntuar filas nuevas o modificadas
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+from model import ModeloAnemiaInfantil, CargadorDatos, AcumuladorMetricas
+
+# Columnas que procesar_poblacion agrega y que se guardan por niño
+COLUMNAS_RESULTADO = [
+    'probabilidad_anemia', 'score_riesgo', 'categoria_riesgo',
+    'descripcion_riesgo', 'color_riesgo', 'departamento_nombre'
+]
+
+
+class PuntuadorIncremental:
+    """
+    Almacén de resultados por clave (HHID) con huella de las variables de entrada
+    Las métricas de generar_metricas_poblacion se actualizan aplicando deltas
+    El almacén recuerda la huella de los parámetros con que se puntuó: si el modelo cambia,
+    la siguiente actualización vuelve a puntuar todas las filas
+    """
+
+    def __init__(self, modelo: ModeloAnemiaInfantil, columna_clave: str = 'HHID'):
+        self.modelo = modelo
+        self.columna_clave = columna_clave
+        self.variables = modelo.params['variables_requeridas']
+
+        # Resultados previos indexados por clave, con la huella de entrada en '_huella'
+        self.almacen = pd.DataFrame(columns=['_huella'] + COLUMNAS_RESULTADO)
+        self.acumulador = AcumuladorMetricas()
+        self.huella_modelo = modelo.huella_parametros()
+        self.ultimo_resumen = {}
+
+    def _reiniciar_si_cambio_modelo(self) -> bool:
+        """Descarta el almacén si fue puntuado con otros parámetros; retorna True si lo descartó"""
+        huella = self.modelo.huella_parametros()
+        if huella == self.huella_modelo:
+            return False
+        self.almacen = pd.DataFrame(columns=['_huella'] + COLUMNAS_RESULTADO)
+        self.acumulador = AcumuladorMetricas()
+        self.huella_modelo = huella
+        return True
+
+    def _huellas(self, df: pd.DataFrame) -> np.ndarray:
+        """Hash por fila de las variables de entrada (1 y 1.0 producen la misma huella)"""
+        return pd.util.hash_pandas_object(df[self.variables].astype('float64'), index=False).to_numpy()
+
+    def actualizar(self, df: pd.DataFrame, eliminar_ausentes: bool = True) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Incorpora el padrón actual: puntúa solo filas nuevas o con variables modificadas
+        Retorna: (df_resultado, metricas) equivalentes a procesar_poblacion y generar_metricas_poblacion
+        """
+        rescoring_completo = self._reiniciar_si_cambio_modelo()
+        claves = pd.Index(df[self.columna_clave])
+        if claves.has_duplicates:
+            raise ValueError(f"La columna {self.columna_clave} tiene valores duplicados")
+
+        huellas = self._huellas(df)
+        huellas_previas = self.almacen['_huella'].reindex(claves)
+        cambiados = huellas_previas.isna().to_numpy() | (huellas_previas.to_numpy() != huellas)
+
+        # Claves cuyo resultado previo deja de valer: modificadas y, opcionalmente, ausentes
+        claves_modificadas = claves[cambiados].intersection(self.almacen.index)
+        claves_ausentes = self.almacen.index.difference(claves) if eliminar_ausentes else pd.Index([])
+        claves_salientes = claves_modificadas.append(claves_ausentes)
+        self.acumulador.quitar(self.almacen.loc[claves_salientes])
+
+        # Puntuar solo lo nuevo o modificado y aplicar el delta
+        df_cambiados = df.loc[cambiados]
+        nuevos = self.modelo.procesar_poblacion(df_cambiados)[COLUMNAS_RESULTADO]
+        nuevos.index = claves[cambiados]
+        nuevos.insert(0, '_huella', huellas[cambiados])
+        self.acumulador.agregar(nuevos)
+
+        almacen_vigente = self.almacen.drop(claves_salientes)
+        self.almacen = pd.concat([almacen_vigente, nuevos]) if len(almacen_vigente) else nuevos
+
+        self.ultimo_resumen = {
+            'filas_recibidas': len(df),
+            'filas_nuevas': int(cambiados.sum()) - len(claves_modificadas),
+            'filas_modificadas': len(claves_modificadas),
+            'filas_sin_cambios': int((~cambiados).sum()),
+            'filas_eliminadas': len(claves_ausentes),
+            'rescoring_completo': rescoring_completo,
+            'version_modelo': self.modelo.version_modelo(),
+        }
+
+        # Resultado completo en el orden recibido, con columnas de entrada actuales
+        df_resultado = df.copy()
+        previos = self.almacen.loc[claves, COLUMNAS_RESULTADO]
+        for columna in COLUMNAS_RESULTADO:
+            df_resultado[columna] = previos[columna].to_numpy()
+
+        return df_resultado, self.acumulador.metricas()
+
+    def metricas(self) -> Dict:
+        """Métricas vigentes del almacén sin recalcular"""
+        return self.acumulador.metricas()
+
+    def guardar(self, directorio: str):
+        """Persiste almacén (Parquet) y acumulado con la huella del modelo (JSON) para la siguiente corrida"""
+        os.makedirs(directorio, exist_ok=True)
+        almacen = self.almacen.rename_axis(self.columna_clave).reset_index()
+        CargadorDatos.guardar_dataset(almacen, os.path.join(directorio, 'almacen.parquet'), compactar=False)
+        with open(os.path.join(directorio, 'acumulador.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version_modelo': self.modelo.version_modelo(),
+                'huella_parametros': self.huella_modelo,
+                'acumulador': self.acumulador.estado(),
+            }, f)
+
+    @classmethod
+    def cargar(cls, directorio: str, modelo: ModeloAnemiaInfantil,
+               columna_clave: str = 'HHID') -> 'PuntuadorIncremental':
+        """
+        Restaura un almacén guardado con guardar(); sin archivos previos inicia vacío
+        Si se guardó con otros parámetros (o sin huella), la siguiente actualización puntúa todo
+        """
+        puntuador = cls(modelo, columna_clave)
+        ruta_almacen = os.path.join(directorio, 'almacen.parquet')
+        if not os.path.exists(ruta_almacen):
+            return puntuador
+
+        puntuador.almacen = CargadorDatos.cargar_columnar(ruta_almacen).set_index(columna_clave)
+        with open(os.path.join(directorio, 'acumulador.json'), 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        puntuador.acumulador = AcumuladorMetricas.desde_estado(estado.get('acumulador', estado))
+        puntuador.huella_modelo = estado.get('huella_parametros')
+        return puntuador
@@ -0,0 +1,202 @@
+"""
+Instrumentación por Etapas - Sistema de Anemia Infantil
+Tiempos, filas, filas/s y delta de memoria por etapa del pipeline, con hooks y exposición Prometheus
+
+Uso:
+    from instrumentacion import Instrumentador
+
+    with Instrumentador() as instrumentador:
+        df_resultado = modelo.procesar_poblacion(CargadorDatos.cargar_dataset("data/endes_muestra.csv"))
+    print(instrumentador.exposicion_prometheus())
+
+Sin un instrumentador activo, medir() devuelve un contexto nulo compartido (costo despreciable)
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Instrumentador activo para todo el proceso (None = instrumentación desactivada)
+_activo: Optional['Instrumentador'] = None
+
+_PAGINA_BYTES = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def memoria_actual() -> int:
+    """
+    Bytes en uso: memoria trazada si tracemalloc está activo, si no RSS del proceso (Linux)
+    """
+    # tracemalloc no se importa aquí: si nadie lo importó, no puede estar trazando
+    tracemalloc = sys.modules.get('tracemalloc')
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGINA_BYTES
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _EtapaNula:
+    """Contexto sin efecto usado cuando la instrumentación está desactivada"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, nombre, valor):
+        # Permite 'etapa.filas = n' sin costo ni estado
+        pass
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+class _Etapa:
+    """Medición de una ejecución de etapa; 'filas' puede fijarse dentro del bloque"""
+
+    __slots__ = ('instrumentador', 'nombre', 'filas', '_inicio', '_memoria_inicio')
+
+    def __init__(self, instrumentador: 'Instrumentador', nombre: str, filas: int):
+        self.instrumentador = instrumentador
+        self.nombre = nombre
+        self.filas = filas
+
+    def __enter__(self):
+        self._memoria_inicio = memoria_actual() if self.instrumentador.medir_memoria else 0
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, *exc):
+        segundos = time.perf_counter() - self._inicio
+        memoria_delta = memoria_actual() - self._memoria_inicio if self.instrumentador.medir_memoria else 0
+        self.instrumentador.registrar(self.nombre, segundos, int(self.filas or 0),
+                                      memoria_delta, error=tipo_error is not None)
+        return False
+
+
+def medir(etapa: str, filas: int = 0):
+    """
+    Contexto que mide una etapa con el instrumentador activo
+    Ej: with medir('puntuar', len(df)): ...   o   with medir('cargar_dataset') as m: m.filas = len(df)
+    """
+    instrumentador = _activo
+    if instrumentador is None:
+        return _ETAPA_NULA
+    return _Etapa(instrumentador, etapa, filas)
+
+
+def instrumentador_activo() -> Optional['Instrumentador']:
+    """Instrumentador activo o None"""
+    return _activo
+
+
+class Instrumentador:
+    """
+    Acumula por etapa: llamadas, errores, filas, segundos y último delta de memoria
+    Cada medición se entrega además a los hooks registrados como un diccionario de evento
+    """
+
+    def __init__(self, medir_memoria: bool = True, prefijo: str = 'anemia'):
+        self.medir_memoria = medir_memoria
+        self.prefijo = prefijo
+        self.hooks: List[Callable[[Dict], None]] = []
+        self.etapas: Dict[str, Dict] = {}
+        self._bloqueo = threading.Lock()
+        self._anterior = None
+
+    def agregar_hook(self, hook: Callable[[Dict], None]) -> 'Instrumentador':
+        """Registra un callback que recibe cada evento de etapa"""
+        self.hooks.append(hook)
+        return self
+
+    def registrar(self, etapa: str, segundos: float, filas: int = 0, memoria_delta: int = 0, error: bool = False):
+        """Incorpora una medición (usado por medir(); también para etapas medidas externamente)"""
+        with self._bloqueo:
+            acumulado = self.etapas.get(etapa)
+            if acumulado is None:
+                acumulado = self.etapas[etapa] = {
+                    'llamadas': 0, 'errores': 0, 'filas': 0, 'segundos': 0.0,
+                    'memoria_delta_bytes': 0, 'memoria_delta_max_bytes': 0,
+                }
+            acumulado['llamadas'] += 1
+            acumulado['errores'] += int(error)
+            acumulado['filas'] += filas
+            acumulado['segundos'] += segundos
+            acumulado['memoria_delta_bytes'] = memoria_delta
+            acumulado['memoria_delta_max_bytes'] = max(acumulado['memoria_delta_max_bytes'], memoria_delta)
+
+        if self.hooks:
+            evento = {
+                'etapa': etapa,
+                'segundos': segundos,
+                'filas': filas,
+                'filas_por_segundo': filas / segundos if segundos > 0 else 0.0,
+                'memoria_delta_bytes': memoria_delta,
+                'error': error,
+            }
+            for hook in self.hooks:
+                hook(evento)
+
+    def resumen(self) -> Dict[str, Dict]:
+        """Acumulados por etapa con filas/s"""
+        with self._bloqueo:
+            resumen = {etapa: dict(acumulado) for etapa, acumulado in self.etapas.items()}
+        for acumulado in resumen.values():
+            segundos = acumulado['segundos']
+            acumulado['filas_por_segundo'] = acumulado['filas'] / segundos if segundos > 0 else 0.0
+        return resumen
+
+    def reiniciar(self):
+        """Descarta los acumulados"""
+        with self._bloqueo:
+            self.etapas = {}
+
+    def exposicion_prometheus(self) -> str:
+        """Formato de exposición de texto de Prometheus (version 0.0.4)"""
+        metricas = [
+            ('etapa_llamadas_total', 'counter', 'Ejecuciones de la etapa', 'llamadas'),
+            ('etapa_errores_total', 'counter', 'Ejecuciones de la etapa terminadas con error', 'errores'),
+            ('etapa_filas_total', 'counter', 'Filas procesadas por la etapa', 'filas'),
+            ('etapa_segundos_total', 'counter', 'Tiempo acumulado en la etapa', 'segundos'),
+            ('etapa_filas_por_segundo', 'gauge', 'Throughput acumulado de la etapa', 'filas_por_segundo'),
+            ('etapa_memoria_delta_bytes', 'gauge', 'Delta de memoria de la última ejecución', 'memoria_delta_bytes'),
+            ('etapa_memoria_delta_max_bytes', 'gauge', 'Mayor delta de memoria observado', 'memoria_delta_max_bytes'),
+        ]
+        resumen = self.resumen()
+
+        lineas = []
+        for nombre, tipo, ayuda, campo in metricas:
+            nombre = f"{self.prefijo}_{nombre}"
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etapa, acumulado in sorted(resumen.items()):
+                etiqueta = etapa.replace('\\', '\\\\').replace('"', '\\"')
+                lineas.append(f'{nombre}{{etapa="{etiqueta}"}} {acumulado[campo]:.10g}')
+        return "\n".join(lineas) + "\n"
+
+    def activar(self) -> 'Instrumentador':
+        """Convierte este instrumentador en el activo del proceso"""
+        global _activo
+        self._anterior = _activo
+        _activo = self
+        return self
+
+    def desactivar(self):
+        """Restaura el instrumentador que estaba activo antes de activar()"""
+        global _activo
+        if _activo is self:
+            _activo = self._anterior
+        self._anterior = None
+
+    def __enter__(self):
+        return self.activar()
+
+    def __exit__(self, *exc):
+        self.desactivar()
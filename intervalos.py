@@ -0,0 +1,132 @@
+"""
+Intervalos de Confianza Bootstrap - Sistema de Anemia Infantil
+Bandas de incertidumbre por departamento para las métricas de generar_metricas_poblacion
+
+Reutiliza las probabilidades ya puntuadas (no vuelve a puntuar). Las filas con igual
+(probabilidad, categoría) son intercambiables, así que cada réplica de un departamento se
+obtiene con un sorteo multinomial sobre sus valores distintos: el costo depende del número
+de réplicas y de valores distintos, no del tamaño de la muestra.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from model import ModeloAnemiaInfantil, CATEGORIAS, metricas_vectorizadas
+
+# Métricas con intervalo (total_ninos es fijo dentro de cada estrato)
+METRICAS_INTERVALO = [
+    'prevalencia_estimada', 'ninos_alto_riesgo', 'ninos_medio_riesgo',
+    'ninos_prioritarios', 'porcentaje_focalizacion', 'casos_prevenibles_estimados',
+]
+
+
+def _valores_distintos(df_resultado: pd.DataFrame):
+    """
+    Departamento, probabilidad, código de riesgo y frecuencia de cada combinación distinta
+    """
+    departamentos, codigos_dept = np.unique(df_resultado['departamento'].to_numpy(), return_inverse=True)
+    codigos_prob, probabilidades = pd.factorize(df_resultado['probabilidad_anemia'])  # NaN -> -1
+    codigos_riesgo = pd.Categorical(df_resultado['categoria_riesgo'], categories=CATEGORIAS).codes
+
+    n_prob = len(probabilidades) + 1
+    n_cat = len(CATEGORIAS) + 1
+    claves = (codigos_dept.astype(np.int64) * n_prob + (codigos_prob + 1)) * n_cat + (codigos_riesgo + 1)
+    claves, frecuencias = np.unique(claves, return_counts=True)
+
+    riesgo = claves % n_cat - 1
+    prob = (claves // n_cat) % n_prob - 1
+    dept = claves // (n_cat * n_prob)
+    valores_prob = np.where(prob >= 0, np.asarray(probabilidades, dtype=float)[np.maximum(prob, 0)], np.nan)
+    return departamentos, dept, valores_prob, riesgo, frecuencias
+
+
+def _replicas_estrato(rng: np.random.Generator, probabilidades: np.ndarray, riesgo: np.ndarray,
+                      frecuencias: np.ndarray, n_replicas: int, tamano_bloque: int) -> Dict[str, np.ndarray]:
+    """
+    Agregados de cada réplica bootstrap de un estrato (remuestreo con reemplazo de sus n filas)
+    """
+    n = int(frecuencias.sum())
+    validas = ~np.isnan(probabilidades)
+    # Matriz de indicadores (valores distintos x agregados) para obtener todos con un producto
+    indicadores = np.column_stack([
+        np.where(validas, probabilidades, 0.0), validas, riesgo == 0, riesgo == 1,
+    ]).astype(float)
+
+    agregados = np.empty((n_replicas, indicadores.shape[1]))
+    for inicio in range(0, n_replicas, tamano_bloque):
+        fin = min(inicio + tamano_bloque, n_replicas)
+        pesos = rng.multinomial(n, frecuencias / n, size=fin - inicio)
+        agregados[inicio:fin] = pesos @ indicadores
+
+    return {
+        'conteo': np.full(n_replicas, n, dtype=np.int64),
+        'suma_probabilidad': agregados[:, 0],
+        'n_probabilidad': np.rint(agregados[:, 1]).astype(np.int64),
+        'por_categoria': np.rint(agregados[:, 2:]).astype(np.int64),
+    }
+
+
+def _puntual(probabilidades: np.ndarray, riesgo: np.ndarray, frecuencias: np.ndarray) -> Dict[str, np.ndarray]:
+    """Agregados de la muestra original de un estrato"""
+    validas = ~np.isnan(probabilidades)
+    return {
+        'conteo': frecuencias.sum(),
+        'suma_probabilidad': (np.where(validas, probabilidades, 0.0) * frecuencias).sum(),
+        'n_probabilidad': frecuencias[validas].sum(),
+        'por_categoria': np.array([frecuencias[riesgo == 0].sum(), frecuencias[riesgo == 1].sum()]),
+    }
+
+
+def intervalos_bootstrap(df_resultado: pd.DataFrame, n_replicas: int = 2000, nivel: float = 0.95,
+                         semilla: int = 42, tamano_bloque: int = 500) -> pd.DataFrame:
+    """
+    Intervalos percentiles bootstrap por departamento y nacional (remuestreo estratificado por departamento)
+    df_resultado: salida de procesar_poblacion
+    Retorna una fila por (departamento, métrica) con estimado, límites y error estándar
+    """
+    departamentos, dept, probabilidades, riesgo, frecuencias = _valores_distintos(df_resultado)
+    rng = np.random.default_rng(semilla)
+    alfa = (1 - nivel) / 2 * 100
+
+    filas: List[Dict] = []
+    nacional_replicas = None
+    nacional_puntual = None
+
+    def agregar_filas(codigo, nombre, puntual, replicas):
+        estimados = metricas_vectorizadas(**puntual)
+        metricas = metricas_vectorizadas(**replicas)
+        for metrica in METRICAS_INTERVALO:
+            valores = metricas[metrica].astype(float)
+            inferior, superior = np.nanpercentile(valores, [alfa, 100 - alfa])
+            filas.append({
+                'departamento': codigo,
+                'departamento_nombre': nombre,
+                'total_ninos': int(puntual['conteo']),
+                'metrica': metrica,
+                'estimado': float(estimados[metrica]),
+                'inferior': float(inferior),
+                'superior': float(superior),
+                'error_estandar': float(np.nanstd(valores, ddof=1)),
+            })
+
+    for i, departamento in enumerate(departamentos):
+        estrato = dept == i
+        puntual = _puntual(probabilidades[estrato], riesgo[estrato], frecuencias[estrato])
+        replicas = _replicas_estrato(rng, probabilidades[estrato], riesgo[estrato], frecuencias[estrato],
+                                     n_replicas, tamano_bloque)
+
+        nombre = ModeloAnemiaInfantil.DEPARTAMENTOS_NOMBRES.get(departamento, f"Departamento {departamento}")
+        agregar_filas(departamento, nombre, puntual, replicas)
+
+        # El total nacional de cada réplica es la suma de las réplicas de sus estratos
+        if nacional_replicas is None:
+            nacional_replicas, nacional_puntual = replicas, puntual
+        else:
+            nacional_replicas = {clave: nacional_replicas[clave] + replicas[clave] for clave in replicas}
+            nacional_puntual = {clave: nacional_puntual[clave] + puntual[clave] for clave in puntual}
+
+    if nacional_replicas is not None:
+        agregar_filas(0, 'Nacional', nacional_puntual, nacional_replicas)
+
+    return pd.DataFrame(filas)
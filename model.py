@@ -4,11 +4,43 @@ MVP - Datatón Exprésate Perú con Datos 2025
 Desarrollado por: Dixon Martinez
 """
 
-import pandas as pd
-import numpy as np
+from __future__ import annotations
+
 import json
 import os
-from typing import Dict, Tuple, List
+import copy
+import hashlib
+import importlib
+import marshal
+from array import array
+from typing import Dict, Tuple, List, Optional, Iterator
+
+from instrumentacion import medir
+
+
+class _ModuloDiferido:
+    """
+    Importa un módulo pesado (pandas, numpy) recién al usar uno de sus atributos
+    y luego se reemplaza por el módulo real en los globales de model.py
+    """
+    
+    def __init__(self, nombre: str, alias: str):
+        self._nombre = nombre
+        self._alias = alias
+    
+    def __getattr__(self, atributo):
+        modulo = importlib.import_module(self._nombre)
+        globals()[self._alias] = modulo
+        return getattr(modulo, atributo)
+
+
+# Puntuar un niño individual no requiere pandas ni numpy: se importan al primer uso vectorizado
+pd = _ModuloDiferido('pandas', 'pd')
+np = _ModuloDiferido('numpy', 'np')
+
+# Formato de la tabla de riesgo compilada (modelo_params.bin); cambiarlo invalida los archivos previos
+FORMATO_COMPILADO = 1
+_HUELLA_CODIGO = None
 
 class ModeloAnemiaInfantil:
     """
@@ -16,27 +48,80 @@ class ModeloAnemiaInfantil:
     AUC: 0.800 - Nivel de excelencia internacional
     """
     
-    def __init__(self, modelo_path: str = "modelo_params.json"):
+    # Umbrales de clasificación: (probabilidad mínima, categoría, descripción, color)
+    NIVELES_RIESGO = [
+        (0.65, "Alto", "Intervención inmediata requerida", "#e74c3c"),
+        (0.45, "Medio", "Monitoreo intensivo y prevención", "#f39c12"),
+        (0.25, "Bajo", "Seguimiento rutinario", "#3498db"),
+        (0.0, "Muy Bajo", "Población de referencia", "#2ecc71"),
+    ]
+    
+    # Nombres legibles de las variables del score lineal, para explicar el riesgo
+    FACTORES_RIESGO = {
+        'quintil': 'Quintil de riqueza',
+        'area_rural': 'Área rural',
+        'grupo_edad': 'Grupo de edad',
+        'quintil_x_rural': 'Quintil × área rural',
+        'primera_infancia_vulnerable': 'Primera infancia vulnerable',
+        'edad_x_vulnerabilidad': 'Edad × vulnerabilidad',
+        'departamento_riesgo': 'Riesgo departamental',
+        'cobertura_programas': 'Cobertura de programas sociales',
+    }
+    
+    # Espacio discreto de las variables que usa el modelo: (variable, mínimo, máximo)
+    DOMINIO_VARIABLES = [
+        ('quintil', 1, 5),
+        ('area_rural', 0, 1),
+        ('grupo_edad', 0, 4),
+        ('departamento', 1, 25),
+        ('programa_juntos', 0, 1),
+        ('programa_qaliwarma', 0, 1),
+    ]
+    
+    # Mapeo de departamentos peruanos
+    DEPARTAMENTOS_NOMBRES = {
+        1: 'Amazonas', 2: 'Áncash', 3: 'Apurímac', 4: 'Arequipa', 5: 'Ayacucho',
+        6: 'Cajamarca', 7: 'Callao', 8: 'Cusco', 9: 'Huancavelica', 10: 'Huánuco',
+        11: 'Ica', 12: 'Junín', 13: 'La Libertad', 14: 'Lambayeque', 15: 'Lima',
+        16: 'Loreto', 17: 'Madre de Dios', 18: 'Moquegua', 19: 'Pasco', 20: 'Piura',
+        21: 'Puno', 22: 'San Martín', 23: 'Tacna', 24: 'Tumbes', 25: 'Ucayali'
+    }
+    
+    def __init__(self, modelo_path: str = "modelo_params.json", params: Optional[dict] = None):
         """
         Inicializa el modelo cargando parámetros desde archivo JSON
+        params permite usar parámetros ya cargados (p.ej. desde un registro de versiones)
         """
         self.modelo_path = modelo_path
-        self.params = self._cargar_parametros()
+        self.params = params if params is not None else self._cargar_parametros()
         self.auc_score = self.params['auc_score']
         self.coeficientes = self.params['coeficientes']
         self.threshold = self.params['threshold_optimizado']
         
-        # Mapeo de departamentos peruanos
-        self.departamentos_nombres = {
-            1: 'Amazonas', 2: 'Áncash', 3: 'Apurímac', 4: 'Arequipa', 5: 'Ayacucho',
-            6: 'Cajamarca', 7: 'Callao', 8: 'Cusco', 9: 'Huancavelica', 10: 'Huánuco',
-            11: 'Ica', 12: 'Junín', 13: 'La Libertad', 14: 'Lambayeque', 15: 'Lima',
-            16: 'Loreto', 17: 'Madre de Dios', 18: 'Moquegua', 19: 'Pasco', 20: 'Piura',
-            21: 'Puno', 22: 'San Martín', 23: 'Tacna', 24: 'Tumbes', 25: 'Ucayali'
-        }
+        self.departamentos_nombres = dict(self.DEPARTAMENTOS_NOMBRES)
+        
+        # Tabla precalculada de riesgo para todas las combinaciones posibles,
+        # desde la forma compilada si corresponde a estos parámetros y a este código
+        if not self._cargar_tabla_compilada():
+            self._construir_tabla_riesgo()
+            if params is None:
+                self.guardar_tabla_compilada()
         
         print(f"✅ Modelo inicializado - AUC: {self.auc_score}")
         
+    def huella_parametros(self) -> str:
+        """
+        Huella SHA-256 de los parámetros vigentes (coeficientes, umbrales, mapeos)
+        """
+        contenido = json.dumps(self.params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    
+    def version_modelo(self) -> str:
+        """
+        Etiqueta de versión: campo 'version' del JSON más los primeros 8 caracteres de la huella
+        """
+        return f"{self.params.get('version', 'sin_version')}+{self.huella_parametros()[:8]}"
+    
     def _cargar_parametros(self) -> dict:
         """Carga parámetros del modelo desde archivo JSON"""
         try:
@@ -51,6 +136,11 @@ class ModeloAnemiaInfantil:
         """
         Crea variables derivadas necesarias para el modelo
         """
+        with medir('variables_derivadas', len(df)):
+            return self._variables_derivadas(df)
+    
+    def _variables_derivadas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Cálculo de las variables derivadas (sin instrumentación)"""
         df_procesado = df.copy()
         
         # Variables de interacción críticas
@@ -67,16 +157,12 @@ class ModeloAnemiaInfantil:
         )
         
         # Riesgo departamental usando mapeos del JSON o valores por defecto
-        try:
-            dept_alto_riesgo = self.params['mapeos']['departamentos_alto_riesgo']
-            dept_bajo_riesgo = self.params['mapeos']['departamentos_bajo_riesgo']
-        except (KeyError, TypeError):
-            # Valores por defecto si no están en el JSON
-            dept_alto_riesgo = [16, 21, 8, 9, 5, 25]  # Loreto, Puno, Cusco, Huancavelica, Ayacucho, Ucayali
-            dept_bajo_riesgo = [15, 11, 4, 7]  # Lima, Ica, Arequipa, Callao
+        dept_alto_riesgo, dept_bajo_riesgo = self._departamentos_riesgo()
         
-        df_procesado['departamento_riesgo'] = df['departamento'].apply(
-            lambda x: 2 if x in dept_alto_riesgo else (0 if x in dept_bajo_riesgo else 1)
+        departamento = df['departamento'].to_numpy()
+        df_procesado['departamento_riesgo'] = np.where(
+            np.isin(departamento, dept_alto_riesgo), 2,
+            np.where(np.isin(departamento, dept_bajo_riesgo), 0, 1)
         )
         
         # Cobertura de programas
@@ -86,6 +172,36 @@ class ModeloAnemiaInfantil:
         
         return df_procesado
     
+    def _departamentos_riesgo(self) -> Tuple[List[int], List[int]]:
+        """
+        Retorna (departamentos_alto_riesgo, departamentos_bajo_riesgo) según mapeos del JSON
+        """
+        try:
+            return (self.params['mapeos']['departamentos_alto_riesgo'],
+                    self.params['mapeos']['departamentos_bajo_riesgo'])
+        except (KeyError, TypeError):
+            # Valores por defecto si no están en el JSON
+            return (
+                [16, 21, 8, 9, 5, 25],  # Loreto, Puno, Cusco, Huancavelica, Ayacucho, Ucayali
+                [15, 11, 4, 7],  # Lima, Ica, Arequipa, Callao
+            )
+    
+    def rangos_variables(self) -> Dict[str, List[int]]:
+        """
+        Rangos [mínimo, máximo] declarados en 'rangos_variables' del JSON,
+        con DOMINIO_VARIABLES como valor por defecto
+        """
+        rangos = {variable: [minimo, maximo] for variable, minimo, maximo in self.DOMINIO_VARIABLES}
+        rangos.update(self.params.get('rangos_variables', {}))
+        return rangos
+    
+    def validar_entrada(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]:
+        """
+        Valida variables_requeridas contra rangos_variables antes de puntuar
+        Retorna: (df_valido, df_cuarentena, errores) como CargadorDatos.validar_dataset
+        """
+        return CargadorDatos.validar_dataset(df, self.params['variables_requeridas'], self.rangos_variables())
+    
     def obtener_nombre_departamento(self, codigo_dept: int) -> str:
         """
         Convierte código de departamento a nombre
@@ -96,78 +212,694 @@ class ModeloAnemiaInfantil:
         """
         Predice probabilidad de anemia para un niño individual
         """
-        # Convertir dict a DataFrame para procesamiento
-        df = pd.DataFrame([datos_nino])
-        df_procesado = self._crear_variables_derivadas(df)
+        tabla = self._obtener_tabla_riesgo()
+        indice = self._indice_tabla_nino(datos_nino, tabla['desplazamientos'])
+        
+        # Fuera del dominio discreto se calcula directamente
+        if indice is None:
+            return self._predecir_probabilidad_directa(datos_nino)
+        
+        return tabla['probabilidad_lista'][indice]
+    
+    def predecir_lote(self, lote: List[Dict]) -> List[float]:
+        """
+        Predice probabilidades para un micro-lote de niños (lista de diccionarios)
+        """
+        tabla = self._obtener_tabla_riesgo()
+        desplazamientos = tabla['desplazamientos']
+        probabilidades = tabla['probabilidad_lista']
+        
+        resultado = []
+        with medir('predecir_lote', len(lote)):
+            for datos_nino in lote:
+                indice = self._indice_tabla_nino(datos_nino, desplazamientos)
+                if indice is None:
+                    resultado.append(self._predecir_probabilidad_directa(datos_nino))
+                else:
+                    resultado.append(probabilidades[indice])
+        
+        return resultado
+    
+    def _indice_tabla_nino(self, datos_nino: Dict, desplazamientos: List[Tuple[str, int, Dict]]) -> Optional[int]:
+        """
+        Calcula el índice de un niño en la tabla de riesgo, o None si está fuera del dominio
+        """
+        indice = 0
+        for variable, tamano, desplazamiento_por_valor in desplazamientos:
+            # 1, 1.0, True y np.int64(1) comparten hash: una sola búsqueda valida y convierte
+            desplazamiento = desplazamiento_por_valor.get(datos_nino[variable])
+            if desplazamiento is None:
+                return None
+            indice = indice * tamano + desplazamiento
+        return indice
+    
+    def _predecir_probabilidad_directa(self, datos_nino: Dict) -> float:
+        """
+        Calcula la probabilidad sin usar la tabla precalculada ni pandas
+        """
+        quintil = datos_nino['quintil']
+        area_rural = datos_nino['area_rural']
+        grupo_edad = datos_nino['grupo_edad']
+        departamento = datos_nino['departamento']
+        dept_alto_riesgo, dept_bajo_riesgo = self._departamentos_riesgo()
+        
+        # Mismas variables derivadas que _crear_variables_derivadas
+        variables = dict(datos_nino)
+        variables['quintil_x_rural'] = quintil * area_rural
+        variables['primera_infancia_vulnerable'] = (grupo_edad <= 1) * (6 - quintil) * 0.1
+        variables['edad_x_vulnerabilidad'] = grupo_edad * (6 - quintil) * 0.05
+        variables['departamento_riesgo'] = (
+            2 if departamento in dept_alto_riesgo else (0 if departamento in dept_bajo_riesgo else 1)
+        )
+        variables['cobertura_programas'] = (
+            datos_nino['programa_juntos'] * 2 + datos_nino['programa_qaliwarma'] * 1.5
+        )
         
         # Calcular score lineal
         score_lineal = self.coeficientes['intercept']
         
         for variable, coef in self.coeficientes.items():
-            if variable != 'intercept' and variable in df_procesado.columns:
-                score_lineal += coef * df_procesado[variable].iloc[0]
+            if variable != 'intercept' and variable in variables:
+                score_lineal += coef * float(variables[variable])
         
-        # Aplicar función logística
-        probabilidad = 1 / (1 + np.exp(-score_lineal))
+        # Aplicar función logística (np.exp para coincidir con el cálculo vectorizado)
+        probabilidad = float(1 / (1 + np.exp(-score_lineal)))
         
         return min(max(probabilidad, 0.05), 0.85)  # Límites realistas
     
+    def _calcular_probabilidades(self, df_procesado: pd.DataFrame) -> np.ndarray:
+        """
+        Calcula score lineal, función logística y límites sobre columnas completas
+        """
+        # Mismo orden de suma que el cálculo individual para resultados idénticos
+        score_lineal = np.full(len(df_procesado), self.coeficientes['intercept'], dtype=float)
+        
+        for variable, coef in self.coeficientes.items():
+            if variable != 'intercept' and variable in df_procesado.columns:
+                score_lineal += coef * df_procesado[variable].to_numpy(dtype=float)
+        
+        probabilidades = 1 / (1 + np.exp(-score_lineal))
+        
+        return np.clip(probabilidades, 0.05, 0.85)  # Límites realistas
+    
+    def _construir_tabla_riesgo(self):
+        """
+        Precalcula probabilidad, score y categoría para cada combinación del dominio discreto
+        """
+        probabilidades = self._calcular_probabilidades(self._crear_variables_derivadas(self._rejilla_dominio()))
+        
+        self._tabla_riesgo = self._tabla_base()
+        self._tabla_riesgo.update({
+            'probabilidad': probabilidades,
+            'score': (probabilidades * 100).astype(int),
+            'codigo': self.codificar_riesgo(probabilidades),
+            # Versión en Python puro para el camino individual de baja latencia
+            'probabilidad_lista': probabilidades.tolist(),
+        })
+    
+    def _rejilla_dominio(self) -> pd.DataFrame:
+        """Todas las combinaciones del dominio discreto, en el orden de los índices de la tabla"""
+        tamanos = [maximo - minimo + 1 for _, minimo, maximo in self.DOMINIO_VARIABLES]
+        rejilla = np.indices(tamanos).reshape(len(tamanos), -1)
+        
+        return pd.DataFrame({
+            variable: rejilla[i] + minimo
+            for i, (variable, minimo, _) in enumerate(self.DOMINIO_VARIABLES)
+        })
+    
+    def _tabla_base(self) -> Dict:
+        """Partes de la tabla de riesgo que no dependen de las probabilidades"""
+        return {
+            'desplazamientos': [
+                (variable, maximo - minimo + 1, {valor: valor - minimo for valor in range(minimo, maximo + 1)})
+                for variable, minimo, maximo in self.DOMINIO_VARIABLES
+            ],
+            # Copias de los parámetros usados, para detectar cambios posteriores
+            'coeficientes': dict(self.coeficientes),
+            'mapeos': copy.deepcopy(self.params.get('mapeos')),
+        }
+    
+    def _tabla_vectorizada(self) -> Dict:
+        """Tabla de riesgo con sus arreglos NumPy, creados desde la forma compilada al primer uso"""
+        tabla = self._obtener_tabla_riesgo()
+        if tabla['probabilidad'] is None:
+            binario = tabla['binario']
+            tabla['score'] = np.frombuffer(binario['score'], dtype=np.int64).astype(int)
+            tabla['codigo'] = np.frombuffer(binario['codigo'], dtype=np.int8)
+            tabla['probabilidad'] = np.frombuffer(binario['probabilidad'], dtype=np.float64)
+        return tabla
+    
+    def ruta_compilada(self) -> str:
+        """Ruta de la tabla compilada junto al JSON (modelo_params.json -> modelo_params.bin)"""
+        return os.path.splitext(self.modelo_path)[0] + '.bin'
+    
+    def _clave_compilada(self) -> Optional[str]:
+        """
+        Huella de parámetros, dominio y código fuente de model.py: cualquier cambio invalida la tabla
+        """
+        global _HUELLA_CODIGO
+        if _HUELLA_CODIGO is None:
+            try:
+                with open(__file__, 'rb') as f:
+                    _HUELLA_CODIGO = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                return None
+        return f"{FORMATO_COMPILADO}:{_HUELLA_CODIGO}:{self.huella_parametros()}"
+    
+    def guardar_tabla_compilada(self, ruta: Optional[str] = None) -> bool:
+        """
+        Guarda la tabla de riesgo en formato binario (marshal, sin pandas ni numpy para leerla)
+        Escritura atómica; retorna False si no se pudo escribir (p.ej. directorio de solo lectura)
+        """
+        clave = self._clave_compilada()
+        if clave is None:
+            return False
+        
+        tabla = self._tabla_vectorizada()
+        contenido = {
+            'clave': clave,
+            'probabilidad': np.asarray(tabla['probabilidad'], dtype=np.float64).tobytes(),
+            'score': np.asarray(tabla['score'], dtype=np.int64).tobytes(),
+            'codigo': np.asarray(tabla['codigo'], dtype=np.int8).tobytes(),
+        }
+        ruta = ruta or self.ruta_compilada()
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, 'wb') as f:
+                marshal.dump(contenido, f)
+            os.replace(temporal, ruta)
+            return True
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return False
+    
+    def _cargar_tabla_compilada(self) -> bool:
+        """Carga la tabla compilada si existe y su clave coincide; si no, retorna False"""
+        try:
+            with open(self.ruta_compilada(), 'rb') as f:
+                contenido = marshal.load(f)
+            if not isinstance(contenido, dict) or contenido.get('clave') != self._clave_compilada():
+                return False
+            probabilidades = array('d', contenido['probabilidad'])
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            return False
+        
+        tamano_dominio = 1
+        for _, minimo, maximo in self.DOMINIO_VARIABLES:
+            tamano_dominio *= maximo - minimo + 1
+        if len(probabilidades) != tamano_dominio:
+            return False
+        
+        self._tabla_riesgo = self._tabla_base()
+        self._tabla_riesgo.update({
+            # Los arreglos NumPy se crean al primer uso vectorizado (_tabla_vectorizada)
+            'probabilidad': None,
+            'score': None,
+            'codigo': None,
+            'binario': contenido,
+            'probabilidad_lista': probabilidades.tolist(),
+        })
+        return True
+    
+    def _obtener_tabla_riesgo(self) -> Dict:
+        """
+        Devuelve la tabla de riesgo, reconstruyéndola si cambiaron coeficientes o mapeos
+        """
+        tabla = self._tabla_riesgo
+        if tabla['coeficientes'] != self.coeficientes or tabla['mapeos'] != self.params.get('mapeos'):
+            self._construir_tabla_riesgo()
+            tabla = self._tabla_riesgo
+        return tabla
+    
+    def _indices_tabla(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula el índice en la tabla de riesgo de cada fila
+        Retorna: (indices, en_dominio)
+        """
+        indices = np.zeros(len(df), dtype=np.int64)
+        en_dominio = np.ones(len(df), dtype=bool)
+        
+        for variable, minimo, maximo in self.DOMINIO_VARIABLES:
+            valores = df[variable].to_numpy()
+            desplazamiento = valores - minimo
+            en_dominio &= (desplazamiento >= 0) & (desplazamiento <= maximo - minimo)
+            if valores.dtype.kind == 'f':
+                en_dominio &= valores == np.floor(valores)
+            indices = indices * (maximo - minimo + 1) + np.where(en_dominio, desplazamiento, 0).astype(np.int64)
+        
+        return indices, en_dominio
+    
+    def _puntuar(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Obtiene probabilidad, score y código de riesgo de cada fila desde la tabla precalculada
+        Retorna: (probabilidades, scores, codigos)
+        """
+        with medir('puntuar', len(df)):
+            tabla = self._tabla_vectorizada()
+            indices, en_dominio = self._indices_tabla(df)
+            
+            probabilidades = tabla['probabilidad'][indices]
+            scores = tabla['score'][indices]
+            codigos = tabla['codigo'][indices]
+            
+            # Filas fuera del dominio discreto: cálculo vectorizado directo
+            if not en_dominio.all():
+                fuera = ~en_dominio
+                probabilidades[fuera] = self._calcular_probabilidades(self._crear_variables_derivadas(df[fuera]))
+                scores[fuera] = (probabilidades[fuera] * 100).astype(int)
+                codigos[fuera] = self.codificar_riesgo(probabilidades[fuera])
+        
+        return probabilidades, scores, codigos
+    
     def clasificar_riesgo(self, probabilidad: float) -> Tuple[str, str, str]:
         """
         Clasifica el riesgo basado en umbrales optimizados
         Retorna: (categoria, descripcion, color)
         """
-        if probabilidad >= 0.65:
-            return "Alto", "Intervención inmediata requerida", "#e74c3c"
-        elif probabilidad >= 0.45:
-            return "Medio", "Monitoreo intensivo y prevención", "#f39c12"
-        elif probabilidad >= 0.25:
-            return "Bajo", "Seguimiento rutinario", "#3498db"
-        else:
-            return "Muy Bajo", "Población de referencia", "#2ecc71"
+        for umbral, categoria, descripcion, color in self.NIVELES_RIESGO:
+            if probabilidad >= umbral:
+                return categoria, descripcion, color
+        
+        return self.NIVELES_RIESGO[-1][1:]
     
-    def procesar_poblacion(self, df: pd.DataFrame) -> pd.DataFrame:
+    def codificar_riesgo(self, probabilidades: np.ndarray) -> np.ndarray:
+        """
+        Devuelve el índice en NIVELES_RIESGO de cada probabilidad (0 = Alto ... 3 = Muy Bajo)
+        """
+        condiciones = [probabilidades >= umbral for umbral, *_ in self.NIVELES_RIESGO[:-1]]
+        return np.select(condiciones, range(len(condiciones)), default=len(condiciones)).astype(np.int8)
+    
+    def clasificar_riesgo_vectorizado(self, probabilidades: np.ndarray,
+                                      codigos: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Clasifica un arreglo de probabilidades con los mismos umbrales que clasificar_riesgo
+        Retorna: (categorias, descripciones, colores)
+        """
+        if codigos is None:
+            codigos = self.codificar_riesgo(probabilidades)
+        categorias, descripciones, colores = (
+            np.array(columna, dtype=object) for columna in list(zip(*self.NIVELES_RIESGO))[1:]
+        )
+        return categorias[codigos], descripciones[codigos], colores[codigos]
+    
+    def procesar_poblacion(self, df: pd.DataFrame, compacto: bool = False) -> pd.DataFrame:
         """
         Procesa dataset completo y genera predicciones poblacionales
+        Con compacto=True usa enteros pequeños, float32 y columnas Categorical
         """
-        # Crear variables derivadas
-        df_procesado = self._crear_variables_derivadas(df)
-        
-        # Calcular probabilidades para toda la población
-        probabilidades = []
+        with medir('procesar_poblacion', len(df)):
+            if compacto:
+                return self._agregar_resultados(CargadorDatos.compactar_tipos(df), compacto=True)
+            return self._agregar_resultados(df.copy())
+    
+    def _agregar_resultados(self, df_resultado: pd.DataFrame,
+                            puntuacion: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                            compacto: bool = False) -> pd.DataFrame:
+        """
+        Agrega en el mismo DataFrame las columnas de predicción y clasificación
+        puntuacion permite reutilizar (probabilidades, scores, codigos) ya calculados
+        """
+        # Probabilidades, scores y categorías desde la tabla precalculada
+        if puntuacion is None:
+            puntuacion = self._puntuar(df_resultado)
+        probabilidades, scores, codigos = puntuacion
         
-        for idx, row in df_procesado.iterrows():
-            datos_nino = row.to_dict()
-            prob = self.predecir_probabilidad(datos_nino)
-            probabilidades.append(prob)
+        if compacto:
+            return self._agregar_resultados_compactos(df_resultado, probabilidades, scores, codigos)
         
         # Agregar resultados al DataFrame
-        df_resultado = df.copy()
         df_resultado['probabilidad_anemia'] = probabilidades
-        df_resultado['score_riesgo'] = [int(p * 100) for p in probabilidades]
+        df_resultado['score_riesgo'] = scores
         
         # Clasificar riesgo
-        clasificaciones = [self.clasificar_riesgo(p) for p in probabilidades]
-        df_resultado['categoria_riesgo'] = [c[0] for c in clasificaciones]
-        df_resultado['descripcion_riesgo'] = [c[1] for c in clasificaciones]
-        df_resultado['color_riesgo'] = [c[2] for c in clasificaciones]
+        with medir('clasificar', len(df_resultado)):
+            categorias, descripciones, colores = self.clasificar_riesgo_vectorizado(probabilidades, codigos)
+            df_resultado['categoria_riesgo'] = categorias
+            df_resultado['descripcion_riesgo'] = descripciones
+            df_resultado['color_riesgo'] = colores
         
         # Agregar nombres de departamentos
         if 'departamento' in df_resultado.columns:
-            df_resultado['departamento_nombre'] = df_resultado['departamento'].apply(
-                self.obtener_nombre_departamento
-            )
+            with medir('nombres_departamento', len(df_resultado)):
+                nombres = df_resultado['departamento'].map(self.departamentos_nombres)
+                sin_nombre = nombres.isna()
+                if sin_nombre.any():
+                    nombres[sin_nombre] = df_resultado.loc[sin_nombre, 'departamento'].map(
+                        self.obtener_nombre_departamento
+                    )
+                df_resultado['departamento_nombre'] = nombres
         
         return df_resultado
     
+    def _agregar_resultados_compactos(self, df_resultado: pd.DataFrame, probabilidades: np.ndarray,
+                                      scores: np.ndarray, codigos: np.ndarray) -> pd.DataFrame:
+        """
+        Variante compacta: etiquetas como Categorical construidas desde códigos, sin cadenas por fila
+        """
+        df_resultado['probabilidad_anemia'] = probabilidades.astype(np.float32)
+        df_resultado['score_riesgo'] = scores.astype(np.int8)
+        
+        with medir('clasificar', len(df_resultado)):
+            _, categorias, descripciones, colores = zip(*self.NIVELES_RIESGO)
+            df_resultado['categoria_riesgo'] = pd.Categorical.from_codes(codigos, categories=categorias)
+            df_resultado['descripcion_riesgo'] = pd.Categorical.from_codes(codigos, categories=descripciones)
+            df_resultado['color_riesgo'] = pd.Categorical.from_codes(codigos, categories=colores)
+        
+        if 'departamento' in df_resultado.columns:
+            with medir('nombres_departamento', len(df_resultado)):
+                codigos_dept, departamentos = pd.factorize(df_resultado['departamento'], sort=True)
+                df_resultado['departamento_nombre'] = pd.Categorical.from_codes(
+                    codigos_dept, categories=[self.obtener_nombre_departamento(d) for d in departamentos]
+                )
+        
+        return df_resultado
+    
+    @staticmethod
+    def reporte_memoria(df_resultado: pd.DataFrame) -> Dict:
+        """
+        Mide la memoria real (incluyendo cadenas) de un resultado de procesar_poblacion
+        """
+        por_columna = df_resultado.memory_usage(deep=True, index=False)
+        total_bytes = int(por_columna.sum())
+        
+        return {
+            'total_ninos': len(df_resultado),
+            'total_bytes': total_bytes,
+            'bytes_por_nino': total_bytes / len(df_resultado) if len(df_resultado) else 0.0,
+            'bytes_por_columna': {columna: int(b) for columna, b in por_columna.items()},
+        }
+    
+    def procesar_poblacion_streaming(self, filepath: str, salida: Optional[str] = None,
+                                     tamano_chunk: int = 100_000, cuarentena: Optional[str] = None) -> Dict:
+        """
+        Procesa un CSV por bloques de tamaño fijo, escribiendo resultados de forma incremental
+        Retorna las mismas métricas que generar_metricas_poblacion sin cargar todo el archivo
+        Con cuarentena (ruta CSV), cada bloque se valida y las filas inválidas se apartan ahí
+        """
+        acumulador = AcumuladorMetricas()
+        en_cuarentena = 0
+        
+        for i, chunk in enumerate(CargadorDatos.iterar_dataset(filepath, tamano_chunk)):
+            if cuarentena is not None:
+                chunk, df_cuarentena, _ = self.validar_entrada(chunk)
+                df_cuarentena.to_csv(cuarentena, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+                en_cuarentena += len(df_cuarentena)
+            
+            # El bloque es propio: se puntúa sin copias adicionales
+            df_resultado = self._agregar_resultados(chunk)
+            acumulador.agregar(df_resultado)
+            
+            if salida is not None:
+                with medir('escribir_bloque', len(df_resultado)):
+                    df_resultado.to_csv(salida, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        
+        if en_cuarentena:
+            print(f"⚠️ {en_cuarentena} registros inválidos apartados en {cuarentena}")
+        return acumulador.metricas()
+    
+    @staticmethod
+    def _top_k_posiciones(probabilidades: np.ndarray, posiciones: np.ndarray, k: int) -> np.ndarray:
+        """
+        Selecciona por partición parcial las k posiciones de mayor probabilidad, ordenadas
+        Empates en el orden original de las filas
+        """
+        if k <= 0:
+            return posiciones[:0]
+        if k < len(posiciones):
+            # Umbral por partición parcial; se conservan todos los empates del borde
+            umbral = np.partition(probabilidades[posiciones], len(posiciones) - k)[len(posiciones) - k]
+            posiciones = posiciones[probabilidades[posiciones] >= umbral]
+        orden = np.argsort(-probabilidades[posiciones], kind='stable')
+        return posiciones[orden][:k]
+    
+    def casos_prioritarios_top(self, df_resultado: pd.DataFrame, k: int = 20, por: Optional[str] = None,
+                               categorias: Tuple[str, ...] = ('Alto', 'Medio')) -> pd.DataFrame:
+        """
+        Los k niños de mayor riesgo (en total o por grupo, p.ej. por='departamento')
+        Usa selección parcial en lugar de ordenar todo el resultado; k=0 retorna un resultado vacío
+        """
+        if k < 0:
+            raise ValueError(f"k debe ser un entero no negativo (recibido {k})")
+        probabilidades = df_resultado['probabilidad_anemia'].to_numpy(dtype=float)
+        prioritarios = df_resultado['categoria_riesgo'].isin(categorias).to_numpy()
+        
+        if por is None:
+            seleccion = self._top_k_posiciones(probabilidades, np.flatnonzero(prioritarios), k)
+            return df_resultado.iloc[seleccion]
+        
+        # Índices por grupo con hash (sin ordenar la población completa)
+        grupos = df_resultado.loc[prioritarios, por]
+        posiciones_prioritarias = np.flatnonzero(prioritarios)
+        seleccion = [
+            self._top_k_posiciones(probabilidades, posiciones_prioritarias[indices], k)
+            for _, indices in sorted(grupos.groupby(grupos, sort=False).indices.items())
+        ]
+        return df_resultado.iloc[np.concatenate(seleccion) if seleccion else []]
+    
+    def iterar_casos_prioritarios(self, df_resultado: pd.DataFrame, tamano_bloque: int = 10_000,
+                                  categorias: Tuple[str, ...] = ('Alto', 'Medio'),
+                                  explicar: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Recorre la lista prioritaria completa en orden de riesgo, por bloques
+        Agrupa por score_riesgo (conteo, 0-100) y solo ordena por probabilidad dentro de cada score
+        Con explicar=True cada bloque incluye 'explicacion_riesgo' (ver explicar_riesgo)
+        """
+        if explicar:
+            for bloque in self.iterar_casos_prioritarios(df_resultado, tamano_bloque, categorias):
+                yield bloque.assign(explicacion_riesgo=self.explicar_riesgo(bloque))
+            return
+        
+        posiciones = np.flatnonzero(df_resultado['categoria_riesgo'].isin(categorias).to_numpy())
+        probabilidades = df_resultado['probabilidad_anemia'].to_numpy(dtype=float)[posiciones]
+        scores = df_resultado['score_riesgo'].to_numpy()[posiciones]
+        
+        # Orden estable por score descendente: clave de 8 bits, NumPy usa radix sort
+        claves = (100 - scores).astype(np.uint8)
+        orden = np.argsort(claves, kind='stable')
+        limites = np.concatenate([[0], np.cumsum(np.bincount(claves, minlength=101))])
+        
+        pendientes = []
+        n_pendientes = 0
+        for inicio, fin in zip(limites[:-1], limites[1:]):
+            if fin == inicio:
+                continue
+            cubeta = orden[inicio:fin]
+            pendientes.append(cubeta[np.argsort(-probabilidades[cubeta], kind='stable')])
+            n_pendientes += len(cubeta)
+            
+            while n_pendientes >= tamano_bloque:
+                bloque = np.concatenate(pendientes)
+                yield df_resultado.iloc[posiciones[bloque[:tamano_bloque]]]
+                pendientes = [bloque[tamano_bloque:]]
+                n_pendientes = len(pendientes[0])
+        
+        if n_pendientes:
+            yield df_resultado.iloc[posiciones[np.concatenate(pendientes)]]
+    
+    def escribir_casos_prioritarios(self, df_resultado: pd.DataFrame, destino,
+                                    tamano_bloque: int = 10_000, explicar: bool = False) -> int:
+        """
+        Escribe en CSV (ruta o archivo abierto) la lista prioritaria completa en orden de riesgo
+        Retorna el número de casos escritos
+        """
+        total = 0
+        bloques = self.iterar_casos_prioritarios(df_resultado, tamano_bloque, explicar=explicar)
+        for i, bloque in enumerate(bloques):
+            bloque.to_csv(destino, index=False, header=(i == 0), mode='w' if i == 0 else 'a')
+            total += len(bloque)
+        
+        if total == 0:
+            vacio = df_resultado.head(0)
+            (vacio.assign(explicacion_riesgo=[]) if explicar else vacio).to_csv(destino, index=False)
+        return total
+    
+    def _contribuciones(self, df_procesado: pd.DataFrame,
+                        referencia: Dict[str, float]) -> Tuple[List[str], np.ndarray]:
+        """
+        Contribución coeficiente × (valor − referencia) de cada variable del score lineal
+        (atribución SHAP exacta de un modelo lineal). Un valor menos riesgoso que la referencia
+        da contribución negativa aunque el coeficiente sea positivo, y viceversa
+        Retorna: (variables, matriz filas × variables); valor base + suma por fila = score lineal
+        """
+        variables = [variable for variable in self.coeficientes if variable != 'intercept']
+        contribuciones = np.zeros((len(df_procesado), len(variables)))
+        for j, variable in enumerate(variables):
+            if variable in df_procesado.columns:
+                valores = df_procesado[variable].to_numpy(dtype=float) - referencia[variable]
+                contribuciones[:, j] = self.coeficientes[variable] * valores
+        return variables, contribuciones
+    
+    def _texto_explicacion(self, variables: List[str], contribuciones: np.ndarray, top: int) -> str:
+        """Factores que más elevan el riesgo, de mayor a menor contribución"""
+        orden = np.argsort(-contribuciones, kind='stable')[:top]
+        factores = [
+            f"{self.FACTORES_RIESGO.get(variables[j], variables[j])} ({contribuciones[j]:+.2f})"
+            for j in orden if contribuciones[j] > 0
+        ]
+        return ", ".join(factores) or "Sin factores que eleven el riesgo"
+    
+    def _tabla_explicaciones(self) -> Dict:
+        """
+        Contribuciones memoizadas para cada combinación del dominio discreto
+        La referencia de cada variable es su media sobre el dominio discreto (todas las combinaciones)
+        Se calculan al primer uso y se descartan junto con la tabla de riesgo si cambian los parámetros
+        """
+        tabla = self._tabla_vectorizada()
+        explicaciones = tabla.get('explicaciones')
+        if explicaciones is None:
+            df_dominio = self._crear_variables_derivadas(self._rejilla_dominio())
+            referencia = {
+                variable: float(df_dominio[variable].mean()) if variable in df_dominio.columns else 0.0
+                for variable in self.coeficientes if variable != 'intercept'
+            }
+            variables, contribuciones = self._contribuciones(df_dominio, referencia)
+            explicaciones = tabla['explicaciones'] = {
+                'variables': variables,
+                'referencia': referencia,
+                'valor_base': self.coeficientes['intercept'] + sum(
+                    self.coeficientes[variable] * valor for variable, valor in referencia.items()
+                ),
+                'contribuciones': contribuciones,
+                'textos': {},  # por valor de top
+            }
+        return explicaciones
+    
+    def valor_base_riesgo(self) -> float:
+        """Score lineal (logit) de la referencia: intercepto + coeficientes × medias del dominio"""
+        return float(self._tabla_explicaciones()['valor_base'])
+    
+    def contribuciones_riesgo(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Descomposición exacta del score lineal (logit) de cada niño por variable, respecto de la referencia
+        valor_base_riesgo() + suma de columnas = score lineal, antes de la función logística y sus límites
+        """
+        explicaciones = self._tabla_explicaciones()
+        indices, en_dominio = self._indices_tabla(df)
+        contribuciones = explicaciones['contribuciones'][indices]
+        
+        # Filas fuera del dominio discreto: cálculo directo
+        if not en_dominio.all():
+            _, contribuciones[~en_dominio] = self._contribuciones(
+                self._crear_variables_derivadas(df[~en_dominio]), explicaciones['referencia']
+            )
+        
+        return pd.DataFrame(contribuciones, columns=explicaciones['variables'], index=df.index)
+    
+    def explicar_riesgo(self, df: pd.DataFrame, top: int = 3) -> np.ndarray:
+        """
+        Texto con los factores que más elevan el riesgo de cada niño respecto de la referencia, p.ej.
+        "Quintil de riqueza (+0.70), Quintil × área rural (+0.41), Área rural (+0.28)"
+        Los textos se memoizan por combinación del dominio: por fila solo hay una lectura indexada
+        """
+        explicaciones = self._tabla_explicaciones()
+        textos = explicaciones['textos'].get(top)
+        if textos is None:
+            variables = explicaciones['variables']
+            textos = explicaciones['textos'][top] = np.array(
+                [self._texto_explicacion(variables, fila, top) for fila in explicaciones['contribuciones']],
+                dtype=object
+            )
+        
+        indices, en_dominio = self._indices_tabla(df)
+        resultado = textos[indices]
+        
+        if not en_dominio.all():
+            variables, contribuciones = self._contribuciones(
+                self._crear_variables_derivadas(df[~en_dominio]), explicaciones['referencia']
+            )
+            resultado[~en_dominio] = [self._texto_explicacion(variables, fila, top) for fila in contribuciones]
+        
+        return resultado
+    
+    def explicar_nino(self, datos_nino: Dict, top: int = 3) -> List[Tuple[str, float]]:
+        """Factores (nombre legible, contribución al logit) que más elevan el riesgo de un niño"""
+        contribuciones = self.contribuciones_riesgo(pd.DataFrame([datos_nino])).iloc[0]
+        contribuciones = contribuciones[contribuciones > 0].sort_values(ascending=False, kind='stable').head(top)
+        return [(self.FACTORES_RIESGO.get(variable, variable), float(valor)) for variable, valor in contribuciones.items()]
+    
     def generar_metricas_poblacion(self, df_resultado: pd.DataFrame) -> Dict:
         """
         Genera métricas de impacto poblacional
         """
-        total_ninos = len(df_resultado)
+        acumulador = AcumuladorMetricas()
+        acumulador.agregar(df_resultado)
+        return acumulador.metricas()
+
+# Clase auxiliar para métricas poblacionales incrementales
+class AcumuladorMetricas:
+    """
+    Agregados acumulables para generar_metricas_poblacion (por bloques o shards)
+    """
+    
+    def __init__(self):
+        self.total_ninos = 0
+        self.suma_probabilidad = 0.0
+        self.n_probabilidad = 0
+        self.conteos_riesgo = {}
+    
+    def agregar(self, df_resultado: pd.DataFrame):
+        """Suma al acumulado un bloque de resultados de procesar_poblacion"""
+        with medir('metricas', len(df_resultado)):
+            probabilidades = df_resultado['probabilidad_anemia'].to_numpy(dtype=float)
+            
+            self.total_ninos += len(df_resultado)
+            self.suma_probabilidad += float(np.nansum(probabilidades))
+            self.n_probabilidad += int(np.count_nonzero(~np.isnan(probabilidades)))
+            
+            for categoria, cantidad in df_resultado['categoria_riesgo'].value_counts().items():
+                self.conteos_riesgo[categoria] = self.conteos_riesgo.get(categoria, 0) + int(cantidad)
+    
+    def quitar(self, df_resultado: pd.DataFrame):
+        """Resta del acumulado filas previamente agregadas (actualización por deltas)"""
+        probabilidades = df_resultado['probabilidad_anemia'].to_numpy(dtype=float)
         
-        # Distribución por riesgo
-        distribucion_riesgo = df_resultado['categoria_riesgo'].value_counts()
+        self.total_ninos -= len(df_resultado)
+        self.suma_probabilidad -= float(np.nansum(probabilidades))
+        self.n_probabilidad -= int(np.count_nonzero(~np.isnan(probabilidades)))
+        
+        for categoria, cantidad in df_resultado['categoria_riesgo'].value_counts().items():
+            self.conteos_riesgo[categoria] = self.conteos_riesgo.get(categoria, 0) - int(cantidad)
+    
+    def combinar(self, otro: 'AcumuladorMetricas') -> 'AcumuladorMetricas':
+        """Incorpora los agregados de otro acumulador (por ejemplo, de otro shard)"""
+        self.total_ninos += otro.total_ninos
+        self.suma_probabilidad += otro.suma_probabilidad
+        self.n_probabilidad += otro.n_probabilidad
+        
+        for categoria, cantidad in otro.conteos_riesgo.items():
+            self.conteos_riesgo[categoria] = self.conteos_riesgo.get(categoria, 0) + cantidad
+        
+        return self
+    
+    def estado(self) -> Dict:
+        """Estado serializable en JSON para persistir el acumulado"""
+        return {
+            'total_ninos': self.total_ninos,
+            'suma_probabilidad': self.suma_probabilidad,
+            'n_probabilidad': self.n_probabilidad,
+            'conteos_riesgo': dict(self.conteos_riesgo),
+        }
+    
+    @classmethod
+    def desde_estado(cls, estado: Dict) -> 'AcumuladorMetricas':
+        """Reconstruye un acumulador guardado con estado()"""
+        acumulador = cls()
+        acumulador.total_ninos = estado['total_ninos']
+        acumulador.suma_probabilidad = estado['suma_probabilidad']
+        acumulador.n_probabilidad = estado['n_probabilidad']
+        acumulador.conteos_riesgo = dict(estado['conteos_riesgo'])
+        return acumulador
+    
+    def metricas(self) -> Dict:
+        """Métricas de impacto con el mismo formato que generar_metricas_poblacion"""
+        total_ninos = self.total_ninos
+        
+        # Distribución por riesgo, de mayor a menor frecuencia
+        distribucion_riesgo = dict(sorted(
+            ((categoria, cantidad) for categoria, cantidad in self.conteos_riesgo.items() if cantidad > 0),
+            key=lambda item: -item[1]
+        ))
         
         # Niños prioritarios (Alto + Medio)
         ninos_prioritarios = distribucion_riesgo.get('Alto', 0) + distribucion_riesgo.get('Medio', 0)
@@ -175,35 +907,304 @@ class ModeloAnemiaInfantil:
         # Métricas de impacto
         metricas = {
             'total_ninos': total_ninos,
-            'prevalencia_estimada': df_resultado['probabilidad_anemia'].mean() * 100,
+            'prevalencia_estimada': (
+                self.suma_probabilidad / self.n_probabilidad * 100 if self.n_probabilidad else float('nan')
+            ),
             'ninos_alto_riesgo': distribucion_riesgo.get('Alto', 0),
             'ninos_medio_riesgo': distribucion_riesgo.get('Medio', 0),
             'ninos_prioritarios': ninos_prioritarios,
             'porcentaje_focalizacion': (ninos_prioritarios / total_ninos) * 100,
             'casos_prevenibles_estimados': int(ninos_prioritarios * 0.25),  # 25% efectividad
-            'distribucion_riesgo': distribucion_riesgo.to_dict()
+            'distribucion_riesgo': distribucion_riesgo
         }
         
         return metricas
 
+# Categorías de riesgo en el orden de NIVELES_RIESGO (Alto, Medio, ...)
+CATEGORIAS = [categoria for _, categoria, _, _ in ModeloAnemiaInfantil.NIVELES_RIESGO]
+
+
+def metricas_vectorizadas(conteo: np.ndarray, suma_probabilidad: np.ndarray, n_probabilidad: np.ndarray,
+                          por_categoria: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Mismas fórmulas que AcumuladorMetricas.metricas, para varios grupos a la vez
+    por_categoria: conteos en el orden de CATEGORIAS sobre el último eje
+    """
+    alto, medio = por_categoria[..., 0], por_categoria[..., 1]
+    prioritarios = alto + medio
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'total_ninos': conteo,
+            'prevalencia_estimada': suma_probabilidad / n_probabilidad * 100,
+            'ninos_alto_riesgo': alto,
+            'ninos_medio_riesgo': medio,
+            'ninos_prioritarios': prioritarios,
+            'porcentaje_focalizacion': prioritarios / conteo * 100,
+            'casos_prevenibles_estimados': (prioritarios * 0.25).astype(np.int64),  # 25% efectividad
+        }
+
 # Clase auxiliar para carga de datos
 class CargadorDatos:
     """
     Utilidades para cargar y validar datasets
     """
     
+    # Extensiones de archivo reconocidas por formato
+    FORMATOS = {
+        '.csv': 'csv',
+        '.parquet': 'parquet', '.pq': 'parquet',
+        '.feather': 'feather', '.arrow': 'feather',
+    }
+    
+    # Tipos compactos para columnas conocidas del esquema ENDES y de resultados
+    TIPOS_COMPACTOS = {
+        'quintil': 'int8', 'area_rural': 'int8', 'grupo_edad': 'int8', 'departamento': 'int8',
+        'electricidad': 'int8', 'agua_potable': 'int8', 'programa_juntos': 'int8',
+        'programa_qaliwarma': 'int8', 'quintil_x_rural': 'int8', 'tiene_anemia': 'int8',
+        'score_riesgo': 'int8', 'probabilidad_anemia': 'float32', 'prob_anemia': 'float32',
+        'primera_infancia_vulnerable': 'float32', 'edad_x_vulnerabilidad': 'float32',
+        'quintil_label': 'category', 'area_label': 'category', 'grupo_edad_label': 'category',
+        'categoria_riesgo': 'category', 'descripcion_riesgo': 'category',
+        'color_riesgo': 'category', 'departamento_nombre': 'category',
+    }
+    
     @staticmethod
-    def cargar_dataset(filepath: str) -> pd.DataFrame:
-        """Carga dataset desde CSV"""
+    def _formato(filepath: str) -> str:
+        """Determina el formato del archivo según su extensión (CSV por defecto)"""
+        return CargadorDatos.FORMATOS.get(os.path.splitext(filepath)[1].lower(), 'csv')
+    
+    @staticmethod
+    def cargar_dataset(filepath: str, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+        """Carga dataset desde CSV, Parquet o Feather, opcionalmente solo ciertas columnas"""
         try:
-            df = pd.read_csv(filepath)
+            with medir('cargar_dataset') as etapa:
+                if CargadorDatos._formato(filepath) == 'csv':
+                    df = pd.read_csv(filepath, usecols=columnas)
+                else:
+                    df = CargadorDatos.cargar_columnar(filepath, columnas)
+                etapa.filas = len(df)
             print(f"✅ Dataset cargado: {len(df)} registros, {df.shape[1]} variables")
             return df
         except FileNotFoundError:
             raise FileNotFoundError(f"No se encontró el archivo {filepath}")
+        except ImportError:
+            raise
         except Exception as e:
             raise Exception(f"Error al cargar dataset: {str(e)}")
     
+    @staticmethod
+    def cargar_columnar(filepath: str, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Carga Parquet o Feather con proyección de columnas y lectura mapeada en memoria
+        Conserva los tipos guardados (int8, float32, category)
+        """
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"No se encontró el archivo {filepath}")
+        
+        try:
+            if CargadorDatos._formato(filepath) == 'parquet':
+                import pyarrow.parquet as pq
+                tabla = pq.read_table(filepath, columns=columnas, memory_map=True)
+            else:
+                import pyarrow.feather as feather
+                tabla = feather.read_table(filepath, columns=columnas, memory_map=True)
+        except ImportError:
+            raise ImportError("Se requiere pyarrow para leer Parquet/Feather: pip install pyarrow")
+        
+        return tabla.to_pandas()
+    
+    @staticmethod
+    def compactar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convierte columnas conocidas a TIPOS_COMPACTOS cuando sus valores lo permiten
+        Siempre retorna un DataFrame nuevo (nunca el recibido)
+        """
+        tipos = {}
+        for columna, tipo in CargadorDatos.TIPOS_COMPACTOS.items():
+            if columna not in df.columns or df[columna].dtype == tipo:
+                continue
+            
+            valores = df[columna]
+            if tipo == 'int8':
+                # Solo enteros sin nulos dentro del rango de int8
+                if not (pd.api.types.is_numeric_dtype(valores) and valores.notna().all()):
+                    continue
+                if not ((valores == valores.round()).all() and valores.between(-128, 127).all()):
+                    continue
+            elif tipo == 'float32' and not pd.api.types.is_float_dtype(valores):
+                continue
+            tipos[columna] = tipo
+        
+        return df.astype(tipos) if tipos else df.copy()
+    
+    @staticmethod
+    def guardar_dataset(df: pd.DataFrame, filepath: str, compactar: bool = True):
+        """
+        Guarda dataset en CSV, Parquet o Feather según la extensión
+        Con compactar=True los formatos columnares usan TIPOS_COMPACTOS
+        """
+        formato = CargadorDatos._formato(filepath)
+        
+        if formato == 'csv':
+            df.to_csv(filepath, index=False)
+            return
+        
+        if compactar:
+            df = CargadorDatos.compactar_tipos(df)
+        
+        try:
+            if formato == 'parquet':
+                df.to_parquet(filepath, index=False)
+            else:
+                df.reset_index(drop=True).to_feather(filepath)
+        except ImportError:
+            raise ImportError("Se requiere pyarrow para escribir Parquet/Feather: pip install pyarrow")
+    
+    @staticmethod
+    def _plan_tipos_csv(filepath: str, columnas: Optional[List[str]], bytes_bloque: int) -> Dict[str, str]:
+        """
+        Pasada previa de plan_tipos para CSV con el lector incremental de pyarrow (memoria acotada)
+        pyarrow fija los tipos del primer bloque: si un bloque posterior no los admite, esa columna
+        se amplía (nulo/entero -> decimal -> texto) y se vuelve a leer; pandas sigue leyendo los bloques
+        """
+        import re
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        
+        forzados = {}
+        while True:
+            lector = pa_csv.open_csv(
+                filepath, read_options=pa_csv.ReadOptions(block_size=bytes_bloque),
+                convert_options=pa_csv.ConvertOptions(column_types=forzados, include_columns=columnas or [])
+            )
+            con_nulos = set()
+            try:
+                for lote in lector:
+                    con_nulos.update(nombre for nombre, columna in zip(lote.schema.names, lote.columns)
+                                     if columna.null_count)
+                break
+            except pa.ArrowInvalid as e:
+                coincidencia = re.search(r'CSV column #(\d+)', str(e))
+                if coincidencia is None:
+                    raise
+                campo = lector.schema.field(int(coincidencia.group(1)))
+                if campo.name in forzados and pa.types.is_string(forzados[campo.name]):
+                    raise
+                numerico = pa.types.is_null(campo.type) or pa.types.is_integer(campo.type)
+                forzados[campo.name] = pa.float64() if numerico else pa.string()
+        
+        tipos = {}
+        for campo in lector.schema:
+            if pa.types.is_null(campo.type) or pa.types.is_floating(campo.type):
+                tipos[campo.name] = 'float64'
+            elif pa.types.is_integer(campo.type) or pa.types.is_boolean(campo.type):
+                # Sin nulos pandas infiere int64 o bool en todos los bloques
+                if campo.name in con_nulos:
+                    tipos[campo.name] = 'float64' if pa.types.is_integer(campo.type) else 'boolean'
+            else:
+                tipos[campo.name] = 'str'  # texto, fechas y otros: como los lee pandas sin tipo
+        return tipos
+    
+    @staticmethod
+    def plan_tipos(filepath: str, columnas: Optional[List[str]] = None,
+                   bytes_bloque: int = 1 << 20) -> Dict[str, str]:
+        """
+        Tipos pandas que mantienen iguales los tipos de todos los bloques de iterar_dataset(tipos=...)
+        Sin plan, cada bloque de un CSV infiere los suyos: una columna vacía en un bloque y con texto
+        en otro, o entera y luego con nulos, cambia de tipo entre bloques
+        CSV: pasada previa por bloques (memoria acotada); Parquet/Feather: desde esquema y conteo de nulos
+        Enteros con nulos -> float64, mezclas con texto -> 'str', columnas siempre vacías -> float64
+        bytes_bloque: tamaño de bloque del lector de CSV de la pasada previa
+        """
+        formato = CargadorDatos._formato(filepath)
+        if formato != 'csv':
+            import pyarrow as pa
+            if formato == 'parquet':
+                import pyarrow.parquet as pq
+                archivo = pq.ParquetFile(filepath, memory_map=True)
+                esquema, metadatos = archivo.schema_arrow, archivo.metadata
+                indices = {metadatos.schema.column(j).path: j for j in range(metadatos.num_columns)}
+                
+                def con_nulos(nombre: str) -> bool:
+                    # Sin estadísticas se asume que puede haber nulos
+                    for i in range(metadatos.num_row_groups):
+                        estadisticas = metadatos.row_group(i).column(indices[nombre]).statistics
+                        if estadisticas is None or not estadisticas.has_null_count or estadisticas.null_count:
+                            return True
+                    return False
+            else:
+                import pyarrow.feather as feather
+                tabla = feather.read_table(filepath, columns=columnas, memory_map=True)
+                esquema = tabla.schema
+                con_nulos = lambda nombre: tabla.column(nombre).null_count > 0
+            
+            # Al pasar a pandas, solo enteros y booleanos numpy cambian de tipo según el bloque (float64
+            # u object con nulos); los guardados como Int64/boolean de pandas se restauran siempre igual
+            extension = {columna['name'] for columna in (esquema.pandas_metadata or {}).get('columns', [])
+                         if str(columna.get('numpy_type', ''))[:1].isupper()}
+            return {
+                campo.name: 'float64' if pa.types.is_integer(campo.type) else 'boolean' for campo in esquema
+                if (pa.types.is_integer(campo.type) or pa.types.is_boolean(campo.type))
+                and (columnas is None or campo.name in columnas)
+                and campo.name not in extension and con_nulos(campo.name)
+            }
+        
+        return CargadorDatos._plan_tipos_csv(filepath, columnas, bytes_bloque)
+    
+    @staticmethod
+    def iterar_dataset(filepath: str, tamano_chunk: int = 100_000,
+                       columnas: Optional[List[str]] = None,
+                       tipos: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Lee un CSV o Parquet en bloques de tamaño fijo para procesarlo con memoria acotada
+        tipos: tipos pandas por columna (ver plan_tipos) para que todos los bloques coincidan
+        """
+        bloques = CargadorDatos._leer_bloques(filepath, tamano_chunk, columnas, tipos)
+        while True:
+            # Se mide solo la lectura de cada bloque, no el trabajo del consumidor
+            with medir('leer_bloque') as etapa:
+                bloque = next(bloques, None)
+                etapa.filas = 0 if bloque is None else len(bloque)
+            if bloque is None:
+                return
+            yield bloque
+    
+    @staticmethod
+    def _leer_bloques(filepath: str, tamano_chunk: int, columnas: Optional[List[str]],
+                      tipos: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+        """Generador de bloques por formato, usado por iterar_dataset"""
+        formato = CargadorDatos._formato(filepath)
+        
+        def a_pandas(lote) -> pd.DataFrame:
+            bloque = lote.to_pandas()
+            return bloque.astype(tipos) if tipos else bloque
+        
+        try:
+            if formato == 'csv':
+                with pd.read_csv(filepath, chunksize=tamano_chunk, usecols=columnas, dtype=tipos) as lector:
+                    yield from lector
+            elif formato == 'parquet':
+                import pyarrow.parquet as pq
+                archivo = pq.ParquetFile(filepath, memory_map=True)
+                for lote in archivo.iter_batches(batch_size=tamano_chunk, columns=columnas):
+                    yield a_pandas(lote)
+            else:
+                # Feather se mapea en memoria; solo cada bloque se convierte a pandas
+                import pyarrow.feather as feather
+                tabla = feather.read_table(filepath, columns=columnas, memory_map=True)
+                for lote in tabla.to_batches(max_chunksize=tamano_chunk):
+                    yield a_pandas(lote)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No se encontró el archivo {filepath}")
+    
+    @staticmethod
+    def huella_dataset(df: pd.DataFrame) -> str:
+        """Huella SHA-256 del contenido de un DataFrame (columnas, índice y valores)"""
+        huella = hashlib.sha256()
+        huella.update(json.dumps([str(c) for c in df.columns]).encode('utf-8'))
+        huella.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return huella.hexdigest()
+    
     @staticmethod
     def validar_variables_requeridas(df: pd.DataFrame, variables_requeridas: List[str]) -> bool:
         """Valida que el dataset tenga las variables necesarias"""
@@ -215,3 +1216,105 @@ class CargadorDatos:
         
         print("✅ Todas las variables requeridas están presentes")
         return True
+    
+    @staticmethod
+    def validar_dataset(df: pd.DataFrame, variables_requeridas: List[str],
+                        rangos: Optional[Dict[str, List[int]]] = None) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]:
+        """
+        Valida y convierte en una pasada vectorizada los códigos enteros de variables_requeridas
+        Cada fila recibe una máscara de bits (bit i = variable i inválida: no numérica, nula,
+        no entera o fuera de su rango [mínimo, máximo])
+        Retorna: (df_valido con tipos convertidos, df_cuarentena con errores_validacion y detalle_errores, errores)
+        """
+        variables_faltantes = [variable for variable in variables_requeridas if variable not in df.columns]
+        if variables_faltantes:
+            raise ValueError(f"Variables faltantes: {variables_faltantes}")
+        if len(variables_requeridas) > 64:
+            raise ValueError("La máscara de errores admite hasta 64 variables")
+        
+        rangos = rangos or {}
+        tipo_mascara = next(tipo for tipo in (np.uint8, np.uint16, np.uint32, np.uint64)
+                            if np.iinfo(tipo).bits >= len(variables_requeridas))
+        
+        with medir('validar', len(df)):
+            errores = np.zeros(len(df), dtype=tipo_mascara)
+            convertidas = {}
+            for bit, variable in enumerate(variables_requeridas):
+                valores = df[variable]
+                if not pd.api.types.is_numeric_dtype(valores) or pd.api.types.is_bool_dtype(valores):
+                    valores = pd.to_numeric(valores, errors='coerce')
+                
+                arreglo = valores.to_numpy()
+                if arreglo.dtype.kind in 'iu':
+                    invalido = np.zeros(len(arreglo), dtype=bool)
+                else:
+                    # Nulos, infinitos y decimales no son códigos válidos
+                    arreglo = valores.to_numpy(dtype=np.float64, na_value=np.nan)
+                    with np.errstate(invalid='ignore'):
+                        invalido = ~np.isfinite(arreglo) | (arreglo != np.floor(arreglo))
+                
+                rango = rangos.get(variable)
+                if rango is not None:
+                    with np.errstate(invalid='ignore'):
+                        invalido |= (arreglo < rango[0]) | (arreglo > rango[1])
+                
+                errores |= invalido.astype(tipo_mascara) << tipo_mascara(bit)
+                convertidas[variable] = arreglo
+            
+            validas = errores == 0
+            df_valido = df.copy() if validas.all() else df[validas].copy()
+            for variable, arreglo in convertidas.items():
+                rango = rangos.get(variable)
+                tipo = 'int8' if rango is not None and -128 <= rango[0] and rango[1] <= 127 else 'int64'
+                df_valido[variable] = arreglo[validas].astype(tipo)
+            
+            df_cuarentena = df[~validas].copy()
+            df_cuarentena['errores_validacion'] = errores[~validas]
+            df_cuarentena['detalle_errores'] = CargadorDatos.describir_errores(errores[~validas], variables_requeridas)
+        
+        return df_valido, df_cuarentena, errores
+    
+    @staticmethod
+    def describir_errores(errores: np.ndarray, variables_requeridas: List[str]) -> np.ndarray:
+        """Convierte máscaras de errores en texto con las variables inválidas (una vez por máscara distinta)"""
+        mascaras, inversa = np.unique(errores, return_inverse=True)
+        textos = np.array([
+            ", ".join(variable for bit, variable in enumerate(variables_requeridas) if (int(mascara) >> bit) & 1)
+            for mascara in mascaras
+        ], dtype=object)
+        return textos[inversa.ravel()]
+    
+    @staticmethod
+    def resumen_validacion(errores: np.ndarray, variables_requeridas: List[str]) -> Dict:
+        """Conteo de filas válidas, en cuarentena y de errores por variable"""
+        en_cuarentena = int(np.count_nonzero(errores))
+        return {
+            'filas': len(errores),
+            'filas_validas': len(errores) - en_cuarentena,
+            'filas_cuarentena': en_cuarentena,
+            'errores_por_variable': {
+                variable: int(np.count_nonzero((errores >> errores.dtype.type(bit)) & 1))
+                for bit, variable in enumerate(variables_requeridas)
+            },
+        }
+    
+    @staticmethod
+    def cargar_validado(filepath: str, variables_requeridas: List[str],
+                        rangos: Optional[Dict[str, List[int]]] = None,
+                        cuarentena: Optional[str] = None) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Carga y valida un dataset; las filas inválidas se escriben en 'cuarentena' (CSV/Parquet/Feather)
+        Retorna: (df_valido, resumen_validacion)
+        """
+        df = CargadorDatos.cargar_dataset(filepath)
+        df_valido, df_cuarentena, errores = CargadorDatos.validar_dataset(df, variables_requeridas, rangos)
+        resumen = CargadorDatos.resumen_validacion(errores, variables_requeridas)
+        
+        if cuarentena is not None and len(df_cuarentena):
+            CargadorDatos.guardar_dataset(df_cuarentena, cuarentena, compactar=False)
+        
+        if resumen['filas_cuarentena']:
+            print(f"⚠️ Validación: {resumen['filas_validas']} válidos, {resumen['filas_cuarentena']} en cuarentena")
+        else:
+            print(f"✅ Validación: {resumen['filas_validas']} registros válidos")
+        return df_valido, resumen
@@ -0,0 +1,155 @@
+"""
+Procesamiento Paralelo de Poblaciones - Sistema de Anemia Infantil
+Distribuye el scoring poblacional entre varios procesos
+
+El pool de ProcesadorParalelo también ejecuta tareas propias con mapear(); el CLI puntuar.py
+lo usa para puntuar archivos completos (formatos, caché, cuarentena) en paralelo.
+"""
+
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from instrumentacion import Instrumentador
+from model import ModeloAnemiaInfantil, CargadorDatos, AcumuladorMetricas
+
+# Modelo cargado una sola vez por proceso trabajador
+_modelo_worker = None
+
+# Columnas de texto del resultado: si son objetos Python viajan como Categorical (códigos), no como cadenas
+COLUMNAS_ETIQUETA = ['categoria_riesgo', 'descripcion_riesgo', 'color_riesgo', 'departamento_nombre']
+
+
+def _inicializar_worker(modelo_path: str, perfil: bool = False):
+    """Carga los parámetros del modelo (y activa la instrumentación) al arrancar cada proceso trabajador"""
+    global _modelo_worker
+    _modelo_worker = ModeloAnemiaInfantil(modelo_path)
+    if perfil:
+        Instrumentador(medir_memoria=False).activar()
+
+
+def _ejecutar_tarea(funcion_tarea: Tuple[Callable, object]):
+    """Llama funcion(modelo del trabajador, tarea) en el proceso trabajador"""
+    funcion, tarea = funcion_tarea
+    return funcion(_modelo_worker, tarea)
+
+
+def _resultado_para_envio(df_resultado: pd.DataFrame) -> Tuple[pd.DataFrame, AcumuladorMetricas]:
+    """Métricas del fragmento y etiquetas compactadas antes de devolverlo al principal"""
+    acumulador = AcumuladorMetricas()
+    acumulador.agregar(df_resultado)
+    # Las cadenas de pandas con pyarrow ya se serializan como buffers; solo se compactan las de objetos
+    for columna in COLUMNAS_ETIQUETA:
+        if columna in df_resultado.columns and df_resultado[columna].dtype == object:
+            df_resultado[columna] = df_resultado[columna].astype('category')
+    return df_resultado, acumulador
+
+
+def _etiquetas_texto(df_resultado: pd.DataFrame) -> pd.DataFrame:
+    """Restaura las etiquetas compactadas como texto (mismo formato que procesar_poblacion)"""
+    for columna in COLUMNAS_ETIQUETA:
+        if columna in df_resultado.columns and isinstance(df_resultado[columna].dtype, pd.CategoricalDtype):
+            df_resultado[columna] = df_resultado[columna].to_numpy(dtype=object)
+    return df_resultado
+
+
+def _procesar_shard(df: pd.DataFrame) -> Tuple[pd.DataFrame, AcumuladorMetricas]:
+    """
+    Puntúa, clasifica y nombra departamentos de un fragmento en el proceso trabajador
+    Retorna solo las columnas de resultado y el acumulado de métricas del fragmento
+    """
+    columnas = list(df.columns)
+    df_resultado = _modelo_worker._agregar_resultados(df)
+    return _resultado_para_envio(df_resultado.drop(columns=columnas))
+
+
+def _procesar_archivo(filepath: str) -> Tuple[pd.DataFrame, AcumuladorMetricas]:
+    """Lee y puntúa un archivo completo en el proceso trabajador"""
+    return _resultado_para_envio(_modelo_worker.procesar_poblacion(CargadorDatos.cargar_dataset(filepath)))
+
+
+class ProcesadorParalelo:
+    """
+    Pool de procesos reutilizable para scoring poblacional en varios núcleos
+    """
+
+    def __init__(self, n_workers: Optional[int] = None, modelo_path: str = "modelo_params.json",
+                 perfil: bool = False):
+        """
+        Inicia el pool; cada trabajador carga modelo_params.json una sola vez
+        Con perfil, cada trabajador activa su propio Instrumentador
+        """
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.modelo = ModeloAnemiaInfantil(modelo_path)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_inicializar_worker,
+            initargs=(modelo_path, perfil)
+        )
+
+    def mapear(self, funcion: Callable, tareas: Iterable) -> List:
+        """
+        Ejecuta funcion(modelo, tarea) en los trabajadores para cada tarea, en orden
+        funcion debe poder importarse desde su módulo (definida a nivel de módulo)
+        """
+        return list(self._executor.map(_ejecutar_tarea, [(funcion, tarea) for tarea in tareas]))
+
+    def procesar(self, datos: Union[pd.DataFrame, List[str]]) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Puntúa un DataFrame (dividido en shards) o una lista de archivos
+        Retorna: (df_resultado, metricas) con el formato de procesar_poblacion y generar_metricas_poblacion
+        (metricas es None si no hay filas)
+        """
+        if not isinstance(datos, pd.DataFrame):
+            resultados = list(self._executor.map(_procesar_archivo, datos))
+            if not resultados:
+                raise ValueError("No hay archivos para procesar")
+
+            # Unir resultados en el orden recibido y combinar métricas de cada archivo
+            df_resultado = _etiquetas_texto(pd.concat([df for df, _ in resultados], ignore_index=True))
+            acumulador = AcumuladorMetricas()
+            for _, acumulador_archivo in resultados:
+                acumulador.combinar(acumulador_archivo)
+            return df_resultado, acumulador.metricas() if acumulador.total_ninos else None
+
+        # Solo las variables del modelo viajan a los trabajadores; vuelven las columnas de resultado
+        variables = [variable for variable, _, _ in self.modelo.DOMINIO_VARIABLES]
+        variables += [variable for variable in self.modelo.coeficientes
+                      if variable not in variables and variable in datos.columns]
+        limites = [len(datos) * i // self.n_workers for i in range(self.n_workers + 1)]
+        shards = [datos.iloc[inicio:fin][variables] for inicio, fin in zip(limites, limites[1:]) if fin > inicio]
+        if not shards:
+            # Sin filas no hay nada que repartir: mismo resultado vacío que procesar_poblacion
+            return self.modelo.procesar_poblacion(datos), None
+        resultados = list(self._executor.map(_procesar_shard, shards))
+
+        df_resultado = datos.copy()
+        columnas_resultado = _etiquetas_texto(pd.concat([df for df, _ in resultados], ignore_index=True))
+        for columna in columnas_resultado.columns:
+            # Se conserva el arreglo (sin pasar por numpy) con el índice original
+            df_resultado[columna] = pd.Series(columnas_resultado[columna].array, index=df_resultado.index)
+
+        acumulador = AcumuladorMetricas()
+        for _, acumulador_shard in resultados:
+            acumulador.combinar(acumulador_shard)
+        return df_resultado, acumulador.metricas()
+
+    def cerrar(self):
+        """Detiene los procesos trabajadores"""
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def procesar_poblacion_paralelo(datos: Union[pd.DataFrame, List[str]], n_workers: Optional[int] = None,
+                                modelo_path: str = "modelo_params.json") -> Tuple[pd.DataFrame, Dict]:
+    """
+    Atajo para puntuar una sola vez con un pool temporal
+    """
+    with ProcesadorParalelo(n_workers, modelo_path) as procesador:
+        return procesador.procesar(datos)
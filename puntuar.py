@@ -0,0 +1,494 @@
+"""
+Scoring por Lotes desde Línea de Comandos - Sistema de Anemia Infantil
+Puntúa uno o varios archivos ENDES (o patrones glob) y escribe resultados y un JSON de métricas
+
+Uso:
+    python puntuar.py data/endes_muestra.csv
+    python puntuar.py "datos/2024/*.csv" --salida resultados/ --formato parquet --workers 4
+    python puntuar.py "datos/**/*.parquet" --tamano-chunk 250000 --validar --perfil
+    python puntuar.py data/endes_muestra.csv --cache .cache_resultados
+
+Cada archivo pasa por tres etapas solapadas: lectura por bloques (hilo), scoring (hilo principal)
+y escritura (hilo), de modo que la E/S de disco coincide con el cálculo.
+Con --cache, un archivo ya puntuado con el mismo contenido y modelo se restaura desde la caché
+"""
+
+import argparse
+import glob
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from cache_resultados import ARCHIVO_RESULTADO, CacheResultados, escribir_metadatos
+from instrumentacion import Instrumentador, instrumentador_activo, medir
+from model import ModeloAnemiaInfantil, CargadorDatos, AcumuladorMetricas
+from paralelo import ProcesadorParalelo
+
+EXTENSIONES_SALIDA = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+# Copia de la cuarentena dentro de una entrada de caché
+ARCHIVO_CUARENTENA = 'cuarentena.csv'
+
+# Marca de fin de una cola entre etapas
+_FIN = object()
+
+
+def expandir_entradas(patrones: List[str]) -> List[str]:
+    """Expande rutas y patrones glob (admite **) en una lista ordenada y sin duplicados"""
+    archivos = []
+    for patron in patrones:
+        if glob.has_magic(patron):
+            archivos.extend(ruta for ruta in sorted(glob.glob(patron, recursive=True)) if os.path.isfile(ruta))
+        else:
+            archivos.append(patron)
+    return list(dict.fromkeys(archivos))
+
+
+def ruta_salida(entrada: str, directorio_salida: str, formato: str, sufijo: str = '_scored') -> str:
+    """<directorio_salida>/<nombre>_scored.<formato>"""
+    nombre = os.path.splitext(os.path.basename(entrada))[0]
+    return os.path.join(directorio_salida, nombre + sufijo + EXTENSIONES_SALIDA[formato])
+
+
+def verificar_salidas_unicas(salidas: List[str]):
+    """Lanza ValueError si dos archivos de entrada escribirían la misma salida"""
+    repetidas = {salida for salida in salidas if salidas.count(salida) > 1}
+    if repetidas:
+        raise ValueError(f"Varios archivos de entrada producirían la misma salida: {sorted(repetidas)}")
+
+
+def _leer_en_segundo_plano(bloques: Iterator, capacidad: int, detener: threading.Event) -> Iterator:
+    """Consume un iterador de bloques en un hilo lector con una cola acotada"""
+    cola = queue.Queue(maxsize=capacidad)
+
+    def poner(elemento) -> bool:
+        # Espera espacio en la cola salvo que el consumidor se haya detenido
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def leer():
+        try:
+            for bloque in bloques:
+                if not poner(bloque):
+                    return
+            poner(_FIN)
+        except BaseException as e:
+            poner(e)
+
+    hilo = threading.Thread(target=leer, name='puntuar-lectura', daemon=True)
+    hilo.start()
+    while True:
+        bloque = cola.get()
+        if bloque is _FIN:
+            break
+        if isinstance(bloque, BaseException):
+            raise bloque
+        yield bloque
+    hilo.join()
+
+
+def _abrir_escritor_arrow(ruta: str, formato: str, esquema):
+    """Escritor incremental de pyarrow para Parquet o Arrow IPC (Feather)"""
+    import pyarrow as pa
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(ruta, esquema)
+    return pa.ipc.new_file(ruta, esquema)
+
+
+class EscritorBloques:
+    """
+    Escribe bloques de resultados en CSV, Parquet o Feather desde un hilo propio
+    Parquet y Feather usan un escritor incremental de pyarrow con el esquema del primer bloque; los
+    bloques deben leerse con tipos fijos (CargadorDatos.plan_tipos) para que todos lo compartan
+    copia: ruta opcional de un Arrow IPC sin compresión con los mismos bloques (entrada de caché);
+    si la copia falla se abandona (error_copia) sin interrumpir la salida
+    """
+
+    def __init__(self, salida: str, formato: str, capacidad: int = 2, copia: Optional[str] = None):
+        self.salida = salida
+        self.formato = formato
+        self.copia = copia
+        self.filas = 0
+        # Archivos Arrow a escribir: {ruta: formato}
+        self._destinos = {}
+        if formato != 'csv':
+            self._destinos[salida] = formato
+        if copia is not None:
+            self._destinos[copia] = 'feather'
+        self._escritores = {}
+        self._esquema = None
+        self.error_copia = None
+        self._error = None
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._hilo = threading.Thread(target=self._consumir, name='puntuar-escritura', daemon=True)
+        self._hilo.start()
+
+    def enviar(self, df_resultado):
+        """Encola un bloque; falla de inmediato si la escritura ya falló"""
+        if self._error is not None:
+            raise self._error
+        self._cola.put(df_resultado)
+
+    def _consumir(self):
+        while True:
+            bloque = self._cola.get()
+            if bloque is _FIN:
+                break
+            if self._error is not None:
+                continue  # se descartan los bloques restantes tras un error
+            try:
+                self._escribir(bloque)
+            except BaseException as e:
+                self._error = e
+        self._cerrar_escritor()
+
+    def _escribir(self, df_resultado):
+        with medir('escribir_bloque', len(df_resultado)):
+            self._escribir_bloque(df_resultado)
+        self.filas += len(df_resultado)
+
+    def _tabla(self, df_resultado):
+        """Bloque como tabla Arrow con el esquema del primer bloque"""
+        import pyarrow as pa
+        tabla = pa.Table.from_pandas(df_resultado, preserve_index=False)
+        if self._esquema is None:
+            self._esquema = tabla.schema
+            return tabla
+        if tabla.schema.equals(self._esquema):
+            return tabla
+        if tabla.schema.names != self._esquema.names:
+            raise ValueError(f"Las columnas del bloque no coinciden con las anteriores: {tabla.schema.names}")
+        try:
+            # Diferencias compatibles (p.ej. columnas sin valores); nunca se reescribe lo ya escrito
+            return tabla.cast(self._esquema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Los tipos del bloque no coinciden con los anteriores: {e}") from e
+
+    def _descartar_copia(self, error: Exception):
+        """Abandona la copia para la caché; la salida principal continúa"""
+        self.error_copia = error
+        self._destinos.pop(self.copia, None)
+        escritor = self._escritores.pop(self.copia, None)
+        if escritor is not None:
+            try:
+                escritor.close()
+            except Exception:
+                pass
+
+    def _escribir_bloque(self, df_resultado):
+        if self.formato == 'csv':
+            df_resultado.to_csv(self.salida, index=False, mode='a' if self.filas else 'w', header=not self.filas)
+        if not self._destinos:
+            return
+
+        try:
+            tabla = self._tabla(df_resultado)
+        except Exception as e:
+            # Con salida CSV, un bloque que no se puede convertir a Arrow solo afecta a la copia
+            if self.formato != 'csv':
+                raise
+            self._descartar_copia(e)
+            return
+
+        for ruta, formato in list(self._destinos.items()):
+            try:
+                if ruta not in self._escritores:
+                    self._escritores[ruta] = _abrir_escritor_arrow(ruta, formato, self._esquema)
+                self._escritores[ruta].write_table(tabla)
+            except Exception as e:
+                if ruta != self.copia:
+                    raise
+                self._descartar_copia(e)
+
+    def _cerrar_escritor(self):
+        for ruta, escritor in list(self._escritores.items()):
+            try:
+                escritor.close()
+            except BaseException as e:
+                self._error = self._error or e
+        self._escritores = {}
+
+    def cerrar(self):
+        """Espera a que termine la escritura y propaga cualquier error"""
+        self._cola.put(_FIN)
+        self._hilo.join()
+        if self._error is not None:
+            raise self._error
+
+
+def puntuar_archivo(modelo: ModeloAnemiaInfantil, entrada: str, salida: str, formato: str = 'csv',
+                    tamano_chunk: int = 100_000, cuarentena: Optional[str] = None,
+                    capacidad: int = 2, cache: Optional[CacheResultados] = None) -> Dict:
+    """
+    Puntúa un archivo con lectura, scoring y escritura solapadas
+    Con cuarentena (ruta CSV), cada bloque se valida y las filas inválidas se apartan ahí
+    Con cache, un archivo con el mismo contenido y modelo se restaura sin volver a puntuarlo
+    Retorna un resumen con filas, tiempo y el estado del AcumuladorMetricas del archivo
+    """
+    if cache is None:
+        resumen = _puntuar_archivo(modelo, entrada, salida, formato, tamano_chunk, cuarentena, capacidad)
+        resumen.pop('error_copia')
+        return resumen
+
+    inicio = time.perf_counter()
+    clave = cache.clave(CacheResultados.huella_archivo(entrada), modelo, validar=cuarentena is not None)
+    entrada_cache = cache.obtener(clave)
+    if entrada_cache is not None:
+        return _restaurar_archivo(entrada_cache, entrada, salida, formato, cuarentena, inicio)
+
+    with cache.escribir(clave) as temporal:
+        resumen = _puntuar_archivo(modelo, entrada, salida, formato, tamano_chunk, cuarentena, capacidad,
+                                   copia=os.path.join(temporal, ARCHIVO_RESULTADO), inicio=inicio)
+        error_copia = resumen.pop('error_copia')
+        if error_copia is not None:
+            # Sin metadatos la entrada se descarta: el archivo quedó puntuado, solo no se guarda en caché
+            print(f"⚠️ {entrada}: no se guardó en caché ({type(error_copia).__name__}: {error_copia})")
+            resumen['cache'] = 'omitido'
+            return resumen
+
+        # Copia de la salida ya serializada (CSV o Parquet): un acierto posterior solo copia el archivo
+        if resumen['salida'] and formato != 'feather':
+            shutil.copyfile(salida, os.path.join(temporal, 'salida' + EXTENSIONES_SALIDA[formato]))
+        if resumen['cuarentena']:
+            shutil.copyfile(cuarentena, os.path.join(temporal, ARCHIVO_CUARENTENA))
+        escribir_metadatos(temporal, {campo: resumen[campo] for campo in
+                                      ('version_modelo', 'filas', 'filas_cuarentena', 'acumulador')})
+    resumen['cache'] = 'nuevo'
+    return resumen
+
+
+def _restaurar_archivo(entrada_cache: Dict, entrada: str, salida: str, formato: str,
+                       cuarentena: Optional[str], inicio: float) -> Dict:
+    """Escribe la salida (y la cuarentena) de un archivo desde su entrada de caché"""
+    metadatos = entrada_cache['metadatos']
+    tabla = entrada_cache['tabla']
+    if tabla is not None:
+        copia_salida = os.path.join(entrada_cache['ruta'], 'salida' + EXTENSIONES_SALIDA[formato])
+        with medir('escribir_bloque', tabla.num_rows):
+            if formato == 'feather':
+                shutil.copyfile(os.path.join(entrada_cache['ruta'], ARCHIVO_RESULTADO), salida)
+            elif os.path.exists(copia_salida):
+                shutil.copyfile(copia_salida, salida)
+            elif formato == 'parquet':
+                import pyarrow.parquet as pq
+                pq.write_table(tabla, salida)
+            else:
+                # Mismos bloques que la escritura original: mismo CSV
+                filas = 0
+                for lote in tabla.to_batches():
+                    lote.to_pandas().to_csv(salida, index=False, mode='a' if filas else 'w', header=not filas)
+                    filas += lote.num_rows
+
+    copia_cuarentena = os.path.join(entrada_cache['ruta'], ARCHIVO_CUARENTENA)
+    en_cuarentena = metadatos['filas_cuarentena'] if cuarentena is not None else 0
+    if en_cuarentena:
+        shutil.copyfile(copia_cuarentena, cuarentena)
+
+    return {
+        'entrada': entrada,
+        'version_modelo': metadatos['version_modelo'],
+        'salida': salida if metadatos['filas'] else None,
+        'filas': metadatos['filas'],
+        'filas_cuarentena': en_cuarentena,
+        'cuarentena': cuarentena if en_cuarentena else None,
+        'segundos': time.perf_counter() - inicio,
+        'acumulador': metadatos['acumulador'],
+        'cache': 'acierto',
+    }
+
+
+def _puntuar_archivo(modelo: ModeloAnemiaInfantil, entrada: str, salida: str, formato: str,
+                     tamano_chunk: int, cuarentena: Optional[str], capacidad: int,
+                     copia: Optional[str] = None, inicio: Optional[float] = None) -> Dict:
+    """Scoring de puntuar_archivo; copia recibe los resultados en Arrow IPC para la caché"""
+    inicio = inicio if inicio is not None else time.perf_counter()
+    acumulador = AcumuladorMetricas()
+    en_cuarentena = 0
+
+    # Con destinos Arrow el esquema queda fijo desde el primer bloque: los tipos se deciden antes de leer
+    tipos = None
+    if formato != 'csv' or copia is not None:
+        with medir('plan_tipos'):
+            tipos = CargadorDatos.plan_tipos(entrada)
+
+    detener = threading.Event()
+    escritor = EscritorBloques(salida, formato, capacidad, copia=copia)
+    try:
+        bloques = CargadorDatos.iterar_dataset(entrada, tamano_chunk, tipos=tipos)
+        for bloque in _leer_en_segundo_plano(bloques, capacidad, detener):
+            if cuarentena is not None:
+                bloque, df_cuarentena, _ = modelo.validar_entrada(bloque)
+                if len(df_cuarentena):
+                    df_cuarentena.to_csv(cuarentena, index=False, mode='a' if en_cuarentena else 'w',
+                                         header=not en_cuarentena)
+                    en_cuarentena += len(df_cuarentena)
+
+            # El bloque es propio: se puntúa sin copias adicionales
+            df_resultado = modelo._agregar_resultados(bloque)
+            acumulador.agregar(df_resultado)
+            escritor.enviar(df_resultado)
+    finally:
+        detener.set()
+        escritor.cerrar()
+
+    return {
+        'entrada': entrada,
+        'version_modelo': modelo.version_modelo(),
+        'salida': salida if escritor.filas else None,
+        'filas': escritor.filas,
+        'filas_cuarentena': en_cuarentena,
+        'cuarentena': cuarentena if en_cuarentena else None,
+        'segundos': time.perf_counter() - inicio,
+        'acumulador': acumulador.estado(),
+        'error_copia': escritor.error_copia,
+    }
+
+
+def _puntuar_archivo_worker(modelo: ModeloAnemiaInfantil, tarea: Dict) -> Dict:
+    """Puntúa un archivo en un trabajador de ProcesadorParalelo; con perfil devuelve además sus etapas"""
+    instrumentador = instrumentador_activo()
+    if instrumentador is not None:
+        instrumentador.reiniciar()
+
+    resumen = puntuar_archivo(modelo, **tarea)
+    if instrumentador is not None:
+        resumen['etapas'] = instrumentador.etapas
+    return resumen
+
+
+def puntuar_archivos(archivos: List[str], directorio_salida: str, formato: str = 'csv',
+                     tamano_chunk: int = 100_000, n_workers: int = 1,
+                     modelo_path: str = "modelo_params.json", validar: bool = False,
+                     perfil: bool = False, cache_dir: Optional[str] = None,
+                     cache_max_bytes: int = 2 * 1024 ** 3) -> Dict:
+    """
+    Puntúa varios archivos (en paralelo con n_workers > 1) y combina sus métricas
+    Con cache_dir, los archivos ya puntuados se restauran desde la caché en disco
+    Retorna el reporte que se guarda como JSON de métricas
+    """
+    if formato not in EXTENSIONES_SALIDA:
+        raise ValueError(f"Formato no soportado: {formato} (use {', '.join(EXTENSIONES_SALIDA)})")
+    if not archivos:
+        raise ValueError("No hay archivos para procesar")
+
+    salidas = [ruta_salida(archivo, directorio_salida, formato) for archivo in archivos]
+    verificar_salidas_unicas(salidas)
+
+    os.makedirs(directorio_salida, exist_ok=True)
+    cache = CacheResultados(cache_dir, cache_max_bytes) if cache_dir else None
+    tareas = [
+        {'entrada': archivo, 'salida': salida, 'formato': formato, 'tamano_chunk': tamano_chunk,
+         'cuarentena': ruta_salida(archivo, directorio_salida, 'csv', '_cuarentena') if validar else None,
+         'cache': cache}
+        for archivo, salida in zip(archivos, salidas)
+    ]
+
+    inicio = time.perf_counter()
+    n_workers = max(1, min(n_workers, len(tareas)))
+    if n_workers == 1:
+        modelo = ModeloAnemiaInfantil(modelo_path)
+        instrumentador = Instrumentador(medir_memoria=False) if perfil else None
+        if instrumentador is not None:
+            instrumentador.activar()
+        try:
+            resumenes = [puntuar_archivo(modelo, **tarea) for tarea in tareas]
+        finally:
+            if instrumentador is not None:
+                instrumentador.desactivar()
+        etapas = [instrumentador.etapas] if instrumentador is not None else []
+    else:
+        with ProcesadorParalelo(n_workers, modelo_path, perfil=perfil) as procesador:
+            resumenes = procesador.mapear(_puntuar_archivo_worker, tareas)
+        etapas = [resumen.pop('etapas') for resumen in resumenes if 'etapas' in resumen]
+
+    # Métricas globales combinando los acumulados de cada archivo
+    acumulador = AcumuladorMetricas()
+    for resumen in resumenes:
+        acumulado = AcumuladorMetricas.desde_estado(resumen.pop('acumulador'))
+        resumen['metricas'] = acumulado.metricas() if acumulado.total_ninos else None
+        acumulador.combinar(acumulado)
+
+    segundos = time.perf_counter() - inicio
+    reporte = {
+        'version_modelo': resumenes[0]['version_modelo'],
+        'parametros': {'formato': formato, 'tamano_chunk': tamano_chunk, 'workers': n_workers,
+                       'validar': validar, 'cache': cache_dir},
+        'total_archivos': len(resumenes),
+        'total_filas': sum(resumen['filas'] for resumen in resumenes),
+        'segundos': segundos,
+        'filas_por_segundo': sum(resumen['filas'] for resumen in resumenes) / segundos if segundos > 0 else 0.0,
+        'metricas': acumulador.metricas() if acumulador.total_ninos else None,
+        'archivos': resumenes,
+    }
+    if perfil:
+        reporte['etapas'] = _combinar_etapas(etapas)
+    return reporte
+
+
+def _combinar_etapas(etapas: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Suma los acumulados por etapa de varios instrumentadores (uno por proceso)"""
+    instrumentador = Instrumentador()
+    for acumulados in etapas:
+        for etapa, acumulado in acumulados.items():
+            combinado = instrumentador.etapas.setdefault(etapa, {campo: 0 for campo in acumulado})
+            for campo in ('llamadas', 'errores', 'filas', 'segundos'):
+                combinado[campo] += acumulado[campo]
+            combinado['memoria_delta_bytes'] = acumulado['memoria_delta_bytes']
+            combinado['memoria_delta_max_bytes'] = max(combinado['memoria_delta_max_bytes'],
+                                                       acumulado['memoria_delta_max_bytes'])
+    return instrumentador.resumen()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scoring por lotes de archivos ENDES")
+    parser.add_argument('entradas', nargs='+', help="Archivos o patrones glob (CSV, Parquet, Feather)")
+    parser.add_argument('--salida', default='resultados', help="Directorio de resultados")
+    parser.add_argument('--formato', choices=sorted(EXTENSIONES_SALIDA), default='csv',
+                        help="Formato de los archivos puntuados")
+    parser.add_argument('--tamano-chunk', type=int, default=100_000, help="Filas por bloque")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para puntuar archivos en paralelo")
+    parser.add_argument('--modelo', default='modelo_params.json', help="Ruta a modelo_params.json")
+    parser.add_argument('--metricas', help="JSON de métricas (por defecto <salida>/metricas.json)")
+    parser.add_argument('--validar', action='store_true',
+                        help="Valida rangos y aparta filas inválidas en <nombre>_cuarentena.csv")
+    parser.add_argument('--perfil', action='store_true', help="Incluye tiempos por etapa en el JSON")
+    parser.add_argument('--cache', help="Directorio de caché de resultados (reutiliza archivos ya puntuados)")
+    parser.add_argument('--cache-max-mb', type=int, default=2048, help="Tamaño máximo de la caché (MB)")
+    args = parser.parse_args(argv)
+
+    archivos = expandir_entradas(args.entradas)
+    faltantes = [archivo for archivo in archivos if not os.path.isfile(archivo)]
+    if not archivos or faltantes:
+        print(f"❌ No se encontraron archivos de entrada: {faltantes or args.entradas}")
+        return 1
+
+    reporte = puntuar_archivos(archivos, args.salida, args.formato, args.tamano_chunk, args.workers,
+                               args.modelo, args.validar, args.perfil, args.cache,
+                               args.cache_max_mb * 1024 ** 2)
+
+    ruta_metricas = args.metricas or os.path.join(args.salida, 'metricas.json')
+    with open(ruta_metricas, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+
+    for resumen in reporte['archivos']:
+        origen = " (caché)" if resumen.get('cache') == 'acierto' else ""
+        print(f"✅ {resumen['entrada']} -> {resumen['salida']}: {resumen['filas']:,} niños "
+              f"en {resumen['segundos']:.2f} s{origen}")
+    print(f"✅ {reporte['total_filas']:,} niños en {reporte['total_archivos']} archivos "
+          f"({reporte['filas_por_segundo']:,.0f} filas/s); métricas en {ruta_metricas}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
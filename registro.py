@@ -0,0 +1,218 @@
+"""
+Registro de Parámetros con Recarga en Caliente - Sistema de Anemia Infantil
+Vigila modelo_params.json (o un directorio de versiones) y cambia de modelo sin detener el scoring
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from model import ModeloAnemiaInfantil
+
+
+def validar_parametros(params: dict):
+    """
+    Verifica estructura y tipos de un conjunto de parámetros antes de activarlo
+    Lanza ValueError con el detalle del problema
+    """
+    if not isinstance(params, dict):
+        raise ValueError("Los parámetros deben ser un objeto JSON")
+
+    for clave in ('auc_score', 'coeficientes', 'threshold_optimizado', 'variables_requeridas'):
+        if clave not in params:
+            raise ValueError(f"Falta la clave requerida '{clave}'")
+
+    coeficientes = params['coeficientes']
+    if not isinstance(coeficientes, dict) or 'intercept' not in coeficientes:
+        raise ValueError("'coeficientes' debe ser un objeto con 'intercept'")
+    for variable, coef in coeficientes.items():
+        if isinstance(coef, bool) or not isinstance(coef, (int, float)):
+            raise ValueError(f"Coeficiente no numérico para '{variable}': {coef!r}")
+
+    mapeos = params.get('mapeos', {})
+    for clave in ('departamentos_alto_riesgo', 'departamentos_bajo_riesgo'):
+        if clave in mapeos and not all(isinstance(d, int) and 1 <= d <= 25 for d in mapeos[clave]):
+            raise ValueError(f"'mapeos.{clave}' debe contener códigos de departamento entre 1 y 25")
+
+    if not isinstance(params['variables_requeridas'], list):
+        raise ValueError("'variables_requeridas' debe ser una lista")
+
+    for variable, rango in params.get('rangos_variables', {}).items():
+        if not (isinstance(rango, list) and len(rango) == 2 and all(isinstance(v, int) for v in rango)
+                and rango[0] <= rango[1]):
+            raise ValueError(f"'rangos_variables.{variable}' debe ser [mínimo, máximo] enteros")
+
+
+def _clave_version(params: dict) -> Tuple:
+    """Orden de versiones: '1.10' > '1.9'; textos no numéricos al final de la comparación"""
+    partes = str(params.get('version', '0')).split('.')
+    return tuple((0, int(p), '') if p.isdigit() else (1, 0, p) for p in partes)
+
+
+class RegistroParametros:
+    """
+    Mantiene el modelo vigente y lo reemplaza atómicamente cuando cambian los parámetros
+    Una versión nueva se carga, valida y precompila (tabla de riesgo) en segundo plano;
+    el scoring en curso sigue usando la versión anterior hasta el intercambio
+    """
+
+    def __init__(self, ruta: str = "modelo_params.json", intervalo_s: float = 2.0):
+        """
+        ruta puede ser un archivo JSON o un directorio con versiones (*.json);
+        en un directorio se activa la de mayor campo 'version' y nunca se retrocede a una
+        menor que la vigente salvo con recargar(forzar=True)
+        """
+        self.ruta = ruta
+        self.intervalo_s = intervalo_s
+        self.ultimo_error = None
+        self.historial: List[Dict] = []
+
+        self._firma = None
+        self._bloqueo_recarga = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+        # Referencia única (versión, modelo): se reemplaza completa, nunca se modifica
+        self._vigente: Optional[Tuple[str, ModeloAnemiaInfantil]] = None
+        if not self.recargar():
+            raise ValueError(f"No se pudo cargar una versión válida desde {ruta}: {self.ultimo_error}")
+
+    def _archivos(self) -> List[str]:
+        """Archivos de parámetros candidatos"""
+        if os.path.isdir(self.ruta):
+            return sorted(glob.glob(os.path.join(self.ruta, '*.json')))
+        return [self.ruta]
+
+    def _firma_actual(self) -> Tuple:
+        """Firma barata (ruta, mtime, tamaño) para detectar cambios sin leer los archivos"""
+        firma = []
+        for archivo in self._archivos():
+            try:
+                estado = os.stat(archivo)
+                firma.append((archivo, estado.st_mtime_ns, estado.st_size))
+            except FileNotFoundError:
+                continue
+        return tuple(firma)
+
+    def _cargar_candidato(self, cambiados: frozenset = frozenset()) -> Tuple[str, ModeloAnemiaInfantil, str]:
+        """
+        Lee, valida y precompila la versión a activar
+        cambiados: archivos modificados desde la última firma; si alguno es inválido (p.ej. a medio
+        escribir) y hay una versión vigente, no se activa nada para no retroceder a una anterior
+        """
+        candidatos = []
+        errores = []
+        cambiados_invalidos = []
+        for archivo in self._archivos():
+            # Un archivo inválido que no cambió se omite sin bloquear a los demás
+            try:
+                with open(archivo, 'r', encoding='utf-8') as f:
+                    params = json.load(f)
+                validar_parametros(params)
+            except (OSError, ValueError) as e:
+                errores.append(f"{os.path.basename(archivo)}: {e}")
+                if archivo in cambiados:
+                    cambiados_invalidos.append(os.path.basename(archivo))
+                continue
+            candidatos.append((_clave_version(params), archivo, params))
+
+        self.ultimo_error = "; ".join(errores) or None
+        if cambiados_invalidos and self._vigente is not None:
+            raise ValueError(f"Archivos modificados no válidos ({', '.join(cambiados_invalidos)}): {self.ultimo_error}")
+        if errores:
+            print(f"⚠️ Parámetros no válidos omitidos: {self.ultimo_error}")
+        if not candidatos:
+            raise ValueError(f"No se encontraron parámetros válidos en {self.ruta}")
+
+        _, archivo, params = max(candidatos, key=lambda c: c[0])
+        modelo = ModeloAnemiaInfantil(archivo, params=params)
+
+        # Verificación de humo con la tabla ya construida
+        modelo.predecir_probabilidad({variable: minimo for variable, minimo, _ in modelo.DOMINIO_VARIABLES})
+        return modelo.version_modelo(), modelo, archivo
+
+    def recargar(self, forzar: bool = False) -> bool:
+        """
+        Carga una versión nueva si los archivos cambiaron; retorna True si hubo intercambio
+        Si la nueva versión es inválida se conserva la vigente y se registra el error
+        forzar: recarga aunque la firma no cambió y permite volver a una versión menor
+        """
+        with self._bloqueo_recarga:
+            firma = self._firma_actual()
+            if firma == self._firma and not forzar:
+                return False
+
+            cambiados = frozenset(archivo for archivo, *_ in set(firma) - set(self._firma or ()))
+            try:
+                version, modelo, archivo = self._cargar_candidato(cambiados)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                self._firma = firma
+                print(f"⚠️ Parámetros no válidos en {self.ruta}, se mantiene la versión vigente: {self.ultimo_error}")
+                return False
+
+            self._firma = firma
+            if self._vigente is not None and self._vigente[0] == version:
+                return False
+            if (self._vigente is not None and not forzar and os.path.isdir(self.ruta)
+                    and _clave_version(modelo.params) < _clave_version(self._vigente[1].params)):
+                self.ultimo_error = f"{version} es anterior a la vigente {self._vigente[0]} (use forzar=True)"
+                print(f"⚠️ No se retrocede de versión en {self.ruta}: {self.ultimo_error}")
+                return False
+
+            self._vigente = (version, modelo)
+            self.historial.append({'version': version, 'archivo': archivo, 'activado': time.time()})
+            print(f"🔄 Versión de modelo activa: {version}")
+            return True
+
+    def vigente(self) -> Tuple[str, ModeloAnemiaInfantil]:
+        """(versión, modelo) vigentes; tomar una sola vez por lote garantiza coherencia"""
+        return self._vigente
+
+    def modelo_actual(self) -> ModeloAnemiaInfantil:
+        """Modelo vigente"""
+        return self._vigente[1]
+
+    def procesar_poblacion(self, df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+        """procesar_poblacion con la versión vigente, etiquetando cada fila en 'version_modelo'"""
+        version, modelo = self._vigente
+        df_resultado = modelo.procesar_poblacion(df, **kwargs)
+        df_resultado['version_modelo'] = version
+        return df_resultado
+
+    def predecir_probabilidad(self, datos_nino: Dict) -> Tuple[float, str]:
+        """Retorna (probabilidad, versión del modelo que la produjo)"""
+        version, modelo = self._vigente
+        return modelo.predecir_probabilidad(datos_nino), version
+
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo_s):
+            try:
+                self.recargar()
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+
+    def iniciar(self) -> 'RegistroParametros':
+        """Inicia la vigilancia en un hilo de fondo"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._vigilar, name='registro-parametros', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        """Detiene la vigilancia"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
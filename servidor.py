@@ -0,0 +1,357 @@
+"""
+Servidor HTTP de Scoring - Sistema de Anemia Infantil
+Servicio asíncrono local con micro-lotes para solicitudes individuales concurrentes
+
+Uso:
+    python servidor.py --host 127.0.0.1 --puerto 8000
+    python servidor.py --vigilar modelos/    # recarga en caliente de versiones de parámetros
+
+Endpoints:
+    POST /predecir        {"quintil": 1, "area_rural": 1, ...}
+    POST /predecir/lote   [{...}, {...}]  o  {"ninos": [{...}, ...]}
+    GET  /salud           estado del servicio y métricas de operación
+    GET  /metricas        métricas por etapa en formato de texto Prometheus
+
+Registros con campos ausentes, no enteros o fuera de rangos_variables: 400 con el error de cada campo;
+en /predecir/lote cada registro inválido recibe su error sin afectar al resto
+Content-Length no entero o negativo: 400 y se cierra la conexión
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from instrumentacion import Instrumentador
+from model import ModeloAnemiaInfantil
+from registro import RegistroParametros
+
+MENSAJES_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class MicroLoteador:
+    """
+    Agrupa solicitudes individuales concurrentes en lotes para predecir_lote
+    Un lote se despacha al cumplirse la ventana de tiempo o al alcanzar max_lote
+    """
+
+    def __init__(self, obtener_vigente: Callable[[], Tuple[str, ModeloAnemiaInfantil]],
+                 ventana_ms: float = 2.0, max_lote: int = 256):
+        self.obtener_vigente = obtener_vigente
+        self.ventana = ventana_ms / 1000
+        self.max_lote = max_lote
+        self._pendientes = []
+        self._temporizador = None
+
+        # Métricas de operación
+        self.lotes_procesados = 0
+        self.ninos_puntuados = 0
+
+    def predecir(self, datos_nino: Dict) -> asyncio.Future:
+        """Encola un niño y devuelve un futuro con (probabilidad, versión del modelo)"""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendientes.append((datos_nino, futuro))
+
+        if len(self._pendientes) >= self.max_lote:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.ventana, self._despachar)
+
+        return futuro
+
+    def _despachar(self):
+        """Puntúa todos los pendientes en un solo lote vectorizado"""
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+
+        pendientes, self._pendientes = self._pendientes, []
+        if not pendientes:
+            return
+
+        # Una sola versión de modelo para todo el lote
+        version, modelo = self.obtener_vigente()
+        lote = [datos for datos, _ in pendientes]
+        try:
+            probabilidades = modelo.predecir_lote(lote)
+        except Exception:
+            # Un registro inválido no debe afectar al resto del lote
+            probabilidades = []
+            for datos in lote:
+                try:
+                    probabilidades.append(modelo.predecir_probabilidad(datos))
+                except Exception as e:
+                    probabilidades.append(e)
+
+        for (_, futuro), probabilidad in zip(pendientes, probabilidades):
+            if futuro.cancelled():
+                continue
+            if isinstance(probabilidad, Exception):
+                futuro.set_exception(probabilidad)
+            else:
+                futuro.set_result((probabilidad, version))
+
+        self.lotes_procesados += 1
+        self.ninos_puntuados += len(lote)
+
+
+class ServidorScoring:
+    """
+    Servidor HTTP/1.1 mínimo sobre asyncio alrededor de ModeloAnemiaInfantil
+    """
+
+    def __init__(self, modelo: Optional[ModeloAnemiaInfantil] = None, ventana_ms: float = 2.0,
+                 max_lote: int = 256, max_bytes_cuerpo: int = 10 * 1024 * 1024,
+                 registro: Optional[RegistroParametros] = None,
+                 instrumentador: Optional[Instrumentador] = None):
+        """
+        Sirve un modelo fijo o, con registro, siempre la versión vigente del registro
+        Con instrumentador, /metricas expone sus métricas por etapa
+        """
+        if registro is not None:
+            self.vigente = registro.vigente
+        elif modelo is not None:
+            version = modelo.version_modelo()
+            self.vigente = lambda: (version, modelo)
+        else:
+            raise ValueError("Se requiere un modelo o un registro de parámetros")
+        self.registro = registro
+        self.instrumentador = instrumentador
+        self.loteador = MicroLoteador(self.vigente, ventana_ms, max_lote)
+        self.max_bytes_cuerpo = max_bytes_cuerpo
+        self.inicio = time.time()
+        self.solicitudes_totales = 0
+        self.errores = 0
+
+    def _formatear(self, probabilidad: float, modelo: ModeloAnemiaInfantil, version: str) -> Dict:
+        """Respuesta estándar de scoring para un niño"""
+        categoria, descripcion, color = modelo.clasificar_riesgo(probabilidad)
+        return {
+            'probabilidad_anemia': probabilidad,
+            'score_riesgo': int(probabilidad * 100),
+            'categoria_riesgo': categoria,
+            'descripcion_riesgo': descripcion,
+            'color_riesgo': color,
+            'version_modelo': version,
+        }
+
+    @staticmethod
+    def _errores_registro(datos_nino, modelo: ModeloAnemiaInfantil) -> Dict[str, str]:
+        """
+        Errores por campo de un registro, con las mismas reglas que validar_entrada:
+        códigos enteros finitos dentro de rangos_variables. Las variables del modelo son obligatorias;
+        las demás variables_requeridas se validan solo si vienen en el registro
+        """
+        if not isinstance(datos_nino, dict):
+            return {'registro': 'se esperaba un objeto JSON'}
+
+        rangos = modelo.rangos_variables()
+        obligatorias = [variable for variable, _, _ in modelo.DOMINIO_VARIABLES]
+        opcionales = [variable for variable in modelo.params['variables_requeridas'] if variable not in obligatorias]
+
+        errores = {}
+        for variable in obligatorias + opcionales:
+            if variable not in datos_nino:
+                if variable in obligatorias:
+                    errores[variable] = 'variable faltante'
+                continue
+
+            valor = datos_nino[variable]
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                errores[variable] = f'debe ser un código entero (recibido {type(valor).__name__})'
+            elif not math.isfinite(valor) or valor != math.floor(valor):
+                errores[variable] = f'debe ser un código entero (recibido {valor})'
+            elif variable in rangos and not rangos[variable][0] <= valor <= rangos[variable][1]:
+                errores[variable] = f'fuera de rango [{rangos[variable][0]}, {rangos[variable][1]}] (recibido {valor})'
+        return errores
+
+    def salud(self) -> Dict:
+        """Estado del servicio y métricas de operación"""
+        lotes = self.loteador.lotes_procesados
+        version, modelo = self.vigente()
+        salud = {
+            'estado': 'ok',
+            'version_modelo': version,
+            'auc_score': modelo.auc_score,
+            'tiempo_activo_s': round(time.time() - self.inicio, 3),
+            'solicitudes_totales': self.solicitudes_totales,
+            'errores': self.errores,
+            'micro_lotes_procesados': lotes,
+            'ninos_puntuados_micro_lotes': self.loteador.ninos_puntuados,
+            'tamano_promedio_micro_lote': self.loteador.ninos_puntuados / lotes if lotes else 0.0,
+        }
+        if self.registro is not None:
+            salud['versiones_activadas'] = len(self.registro.historial)
+            salud['ultimo_error_recarga'] = self.registro.ultimo_error
+        return salud
+
+    async def _atender(self, metodo: str, ruta: str, cuerpo: bytes):
+        """Enruta una solicitud y devuelve (estado, respuesta)"""
+        if ruta == '/salud':
+            if metodo != 'GET':
+                return 405, {'error': 'Use GET'}
+            return 200, self.salud()
+
+        if ruta == '/metricas':
+            if metodo != 'GET':
+                return 405, {'error': 'Use GET'}
+            if self.instrumentador is None:
+                return 404, {'error': 'Instrumentación desactivada (use --metricas)'}
+            return 200, self.instrumentador.exposicion_prometheus()
+
+        if ruta not in ('/predecir', '/predecir/lote'):
+            return 404, {'error': f'Ruta no encontrada: {ruta}'}
+        if metodo != 'POST':
+            return 405, {'error': 'Use POST'}
+
+        try:
+            datos = json.loads(cuerpo or b'null')
+        except ValueError:
+            return 400, {'error': 'JSON inválido'}
+
+        if ruta == '/predecir':
+            errores = self._errores_registro(datos, self.vigente()[1])
+            if errores:
+                return 400, {'error': 'Registro inválido', 'errores': errores}
+            probabilidad, version = await self.loteador.predecir(datos)
+            _, modelo = self.vigente()
+            return 200, self._formatear(probabilidad, modelo, version)
+
+        lote = datos.get('ninos') if isinstance(datos, dict) else datos
+        if not isinstance(lote, list):
+            return 400, {'error': 'Se esperaba una lista de niños o {"ninos": [...]}'}
+
+        # Cada registro se valida por separado: uno inválido no afecta al resto del lote
+        version, modelo = self.vigente()
+        errores_lote = [self._errores_registro(datos_nino, modelo) for datos_nino in lote]
+        validos = [datos_nino for datos_nino, errores in zip(lote, errores_lote) if not errores]
+        probabilidades = iter(modelo.predecir_lote(validos) if validos else [])
+
+        resultados = [
+            {'error': 'Registro inválido', 'errores': errores} if errores
+            else self._formatear(next(probabilidades), modelo, version)
+            for errores in errores_lote
+        ]
+        return 200, {'resultados': resultados, 'registros_invalidos': len(lote) - len(validos)}
+
+    async def _manejar_conexion(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        """Atiende solicitudes HTTP/1.1 con keep-alive en una conexión"""
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+
+                try:
+                    metodo, ruta, version = linea.decode('latin-1').split()
+                except ValueError:
+                    self.errores += 1
+                    await self._responder(escritor, 400, {'error': 'Línea de solicitud inválida'}, False)
+                    break
+
+                encabezados = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    encabezados[nombre.strip().lower()] = valor.strip()
+
+                mantener = (encabezados.get('connection', '').lower() != 'close'
+                            and version.upper() == 'HTTP/1.1')
+
+                try:
+                    longitud = int(encabezados.get('content-length', 0) or 0)
+                    if longitud < 0:
+                        raise ValueError(longitud)
+                except ValueError:
+                    # Sin una longitud válida no se puede delimitar el cuerpo: se cierra la conexión
+                    self.errores += 1
+                    await self._responder(escritor, 400, {'error': 'Content-Length inválido'}, False)
+                    break
+                if longitud > self.max_bytes_cuerpo:
+                    self.errores += 1
+                    await self._responder(escritor, 413, {'error': 'Cuerpo demasiado grande'}, False)
+                    break
+                cuerpo = await lector.readexactly(longitud) if longitud else b''
+
+                self.solicitudes_totales += 1
+                try:
+                    estado, respuesta = await self._atender(metodo.upper(), ruta.split('?', 1)[0], cuerpo)
+                except Exception as e:
+                    # El detalle interno no se expone al cliente
+                    print(f"❌ Error atendiendo {metodo} {ruta}: {type(e).__name__}: {e}")
+                    estado, respuesta = 500, {'error': 'Error interno del servidor'}
+                if estado >= 400:
+                    self.errores += 1
+
+                await self._responder(escritor, estado, respuesta, mantener)
+                if not mantener:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _responder(self, escritor: asyncio.StreamWriter, estado: int, respuesta, mantener: bool):
+        """Escribe una respuesta JSON (o texto plano si la respuesta es una cadena)"""
+        if isinstance(respuesta, str):
+            cuerpo = respuesta.encode('utf-8')
+            tipo = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            cuerpo = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+            tipo = "application/json; charset=utf-8"
+        encabezados = (
+            f"HTTP/1.1 {estado} {MENSAJES_HTTP.get(estado, '')}\r\n"
+            f"Content-Type: {tipo}\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n"
+        )
+        escritor.write(encabezados.encode('latin-1') + cuerpo)
+        await escritor.drain()
+
+    async def iniciar(self, host: str = '127.0.0.1', puerto: int = 8000) -> asyncio.AbstractServer:
+        """Comienza a escuchar; puerto=0 elige un puerto libre (útil para pruebas locales)"""
+        return await asyncio.start_server(self._manejar_conexion, host, puerto)
+
+
+async def _ejecutar(host: str, puerto: int, modelo_path: str, ventana_ms: float, max_lote: int,
+                    vigilar: Optional[str] = None, metricas: bool = False):
+    instrumentador = Instrumentador(medir_memoria=False).activar() if metricas else None
+    if vigilar:
+        registro = RegistroParametros(vigilar).iniciar()
+        servidor = ServidorScoring(ventana_ms=ventana_ms, max_lote=max_lote, registro=registro,
+                                   instrumentador=instrumentador)
+    else:
+        servidor = ServidorScoring(ModeloAnemiaInfantil(modelo_path), ventana_ms, max_lote,
+                                   instrumentador=instrumentador)
+    servidor_asyncio = await servidor.iniciar(host, puerto)
+    print(f"✅ Servidor de scoring en http://{host}:{puerto}")
+    async with servidor_asyncio:
+        await servidor_asyncio.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP de scoring de anemia infantil")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--modelo', default='modelo_params.json', help="Ruta a modelo_params.json")
+    parser.add_argument('--ventana-ms', type=float, default=2.0, help="Ventana de agrupación de micro-lotes")
+    parser.add_argument('--max-lote', type=int, default=256, help="Tamaño máximo de micro-lote")
+    parser.add_argument('--vigilar', help="Archivo o directorio de parámetros a recargar en caliente")
+    parser.add_argument('--metricas', action='store_true', help="Activa la instrumentación y GET /metricas")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_ejecutar(args.host, args.puerto, args.modelo, args.ventana_ms, args.max_lote,
+                              args.vigilar, args.metricas))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Pruebas del motor predictivo (model.py)
+Ejecutar: python -m pytest -q test_model.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import ModeloAnemiaInfantil
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+NINO_BASE = {'grupo_edad': 1, 'departamento': 15, 'programa_juntos': 0, 'programa_qaliwarma': 0}
+
+
+@pytest.fixture(scope='module')
+def modelo():
+    return ModeloAnemiaInfantil(os.path.join(RAIZ, 'modelo_params.json'))
+
+
+@pytest.fixture(scope='module')
+def muestra():
+    return pd.read_csv(os.path.join(RAIZ, 'data', 'endes_muestra.csv'))
+
+
+def test_contribuciones_suman_el_score_lineal(modelo, muestra):
+    df_resultado = modelo.procesar_poblacion(muestra)
+    logit = modelo.valor_base_riesgo() + modelo.contribuciones_riesgo(muestra).sum(axis=1).to_numpy()
+    probabilidades = np.clip(1 / (1 + np.exp(-logit)), 0.05, 0.85)
+    np.testing.assert_allclose(probabilidades, df_resultado['probabilidad_anemia'].to_numpy())
+
+
+def test_quintil_bajo_se_explica_como_factor_de_riesgo(modelo):
+    factores = dict(modelo.explicar_nino(dict(NINO_BASE, quintil=1, area_rural=0)))
+    assert factores.get('Quintil de riqueza', 0) > 0
+
+
+def test_departamento_de_riesgo_medio_no_eleva_el_riesgo(modelo):
+    nino = dict(NINO_BASE, quintil=3, area_rural=0, departamento=13)  # La Libertad: riesgo medio
+    contribuciones = modelo.contribuciones_riesgo(pd.DataFrame([nino]))
+    assert contribuciones['departamento_riesgo'].iloc[0] <= 0
+    assert contribuciones['quintil'].iloc[0] == pytest.approx(0)
+
+
+@pytest.mark.parametrize('por', [None, 'departamento'])
+def test_top_k_cero_retorna_vacio(modelo, muestra, por):
+    df_resultado = modelo.procesar_poblacion(muestra)
+    assert len(modelo.casos_prioritarios_top(df_resultado, k=0, por=por)) == 0
+    assert len(modelo.casos_prioritarios_top(df_resultado, k=1, por=por)) >= 1
+
+
+def test_top_k_negativo_es_un_error(modelo, muestra):
+    with pytest.raises(ValueError, match="k debe ser"):
+        modelo.casos_prioritarios_top(modelo.procesar_poblacion(muestra), k=-1)
+
+
+def test_plan_tipos_fija_los_tipos_de_todos_los_bloques(muestra, tmp_path):
+    from model import CargadorDatos
+    df = muestra.copy()
+    fila = np.arange(len(df))
+    df['observacion'] = np.where(fila >= 600, 'revisar', None)
+    df['peso'] = np.where(fila >= 700, 12, np.nan)
+    df['conteo'] = np.where(fila >= 800, 2.5, 1)
+    df['n_visitas'] = pd.array(np.where(fila >= 900, None, fila), dtype='object')
+    df['revisado'] = np.where(fila >= 950, None, fila % 2 == 0)
+    ruta_csv = str(tmp_path / 'disperso.csv')
+    df.to_csv(ruta_csv, index=False)
+    ruta_parquet = str(tmp_path / 'disperso.parquet')
+    pd.read_csv(ruta_csv).to_parquet(ruta_parquet)
+
+    for ruta in (ruta_csv, ruta_parquet):
+        tipos = CargadorDatos.plan_tipos(ruta, bytes_bloque=4096)  # varios bloques en la pasada previa
+        tipos_bloques = {tuple(bloque.dtypes.astype(str))
+                         for bloque in CargadorDatos.iterar_dataset(ruta, 250, tipos=tipos)}
+        assert len(tipos_bloques) == 1, ruta
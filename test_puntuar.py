@@ -0,0 +1,71 @@
+"""
+Pruebas de regresión del CLI de puntuación por lotes (puntuar.py)
+Ejecutar: python -m pytest -q test_puntuar.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import puntuar
+from cache_resultados import ARCHIVO_RESULTADO
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+MODELO = os.path.join(RAIZ, 'modelo_params.json')
+LECTORES = {'csv': pd.read_csv, 'parquet': pd.read_parquet, 'feather': pd.read_feather}
+
+
+@pytest.fixture
+def csv_disperso(tmp_path):
+    """Muestra con columnas vacías en el primer bloque y de otro tipo en bloques posteriores"""
+    df = pd.read_csv(os.path.join(RAIZ, 'data', 'endes_muestra.csv'))
+    fila = np.arange(len(df))
+    df['observacion'] = np.where(fila >= 600, 'revisar', None)  # vacía y luego texto
+    df['peso'] = np.where(fila >= 700, 12, np.nan)                # vacía y luego enteros
+    df['conteo'] = np.where(fila >= 800, 2.5, 1)                  # enteros y luego decimales
+    ruta = tmp_path / 'disperso.csv'
+    df.to_csv(ruta, index=False)
+    return str(ruta), len(df)
+
+
+def _puntuar(entrada, directorio, formato, cache_dir=None):
+    reporte = puntuar.puntuar_archivos([entrada], str(directorio), formato, 250,
+                                       modelo_path=MODELO, cache_dir=cache_dir)
+    salida = os.path.join(str(directorio), 'disperso_scored' + puntuar.EXTENSIONES_SALIDA[formato])
+    return reporte['archivos'][0], LECTORES[formato](salida)
+
+
+@pytest.mark.parametrize('con_cache', [False, True])
+@pytest.mark.parametrize('formato', ['csv', 'parquet', 'feather'])
+def test_columnas_que_cambian_de_tipo_entre_bloques(tmp_path, csv_disperso, formato, con_cache):
+    entrada, filas = csv_disperso
+    cache_dir = str(tmp_path / 'cache') if con_cache else None
+
+    resumen, leido = _puntuar(entrada, tmp_path / 'salida', formato, cache_dir)
+    assert len(leido) == filas
+    assert leido['observacion'].iloc[-1] == 'revisar'
+    assert float(leido['conteo'].iloc[-1]) == 2.5
+    if con_cache:
+        assert resumen['cache'] == 'nuevo'
+        resumen, restaurado = _puntuar(entrada, tmp_path / 'restaurado', formato, cache_dir)
+        assert resumen['cache'] == 'acierto'
+        pd.testing.assert_frame_equal(restaurado, leido)
+
+
+def test_fallo_de_la_copia_no_interrumpe_la_puntuacion(tmp_path, csv_disperso, monkeypatch):
+    entrada, filas = csv_disperso
+    abrir = puntuar._abrir_escritor_arrow
+
+    def abrir_fallando_copia(ruta, formato, esquema):
+        if os.path.basename(ruta) == ARCHIVO_RESULTADO:
+            raise OSError("sin espacio en disco")
+        return abrir(ruta, formato, esquema)
+
+    monkeypatch.setattr(puntuar, '_abrir_escritor_arrow', abrir_fallando_copia)
+    cache_dir = str(tmp_path / 'cache')
+    resumen, leido = _puntuar(entrada, tmp_path / 'salida', 'parquet', cache_dir)
+    assert resumen['cache'] == 'omitido'
+    assert len(leido) == filas
+    assert not [nombre for nombre in os.listdir(cache_dir) if not nombre.startswith('.')]
@@ -0,0 +1,59 @@
+"""
+Pruebas del registro de parámetros con recarga en caliente (registro.py)
+Ejecutar: python -m pytest -q test_registro.py
+"""
+
+import json
+import os
+
+import pytest
+
+from registro import RegistroParametros
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def params_base():
+    with open(os.path.join(RAIZ, 'modelo_params.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _escribir_version(directorio, nombre, params, version, intercepto_delta=0.0):
+    params = dict(params, version=version)
+    params['coeficientes'] = dict(params['coeficientes'])
+    params['coeficientes']['intercept'] += intercepto_delta
+    ruta = directorio / nombre
+    ruta.write_text(json.dumps(params), encoding='utf-8')
+    return ruta
+
+
+def test_version_nueva_a_medio_escribir_no_retrocede(tmp_path, params_base):
+    _escribir_version(tmp_path, 'v1.json', params_base, '1.0')
+    v2 = _escribir_version(tmp_path, 'v2.json', params_base, '2.0', intercepto_delta=0.1)
+    registro = RegistroParametros(str(tmp_path))
+    vigente = registro.vigente()[0]
+    assert vigente.startswith('2.0+')
+
+    contenido = v2.read_text(encoding='utf-8')
+    v2.write_text(contenido[:len(contenido) // 2], encoding='utf-8')
+    assert registro.recargar() is False
+    assert registro.vigente()[0] == vigente
+    assert 'v2.json' in registro.ultimo_error
+
+    # Al terminar de escribirse, la nueva versión se activa
+    _escribir_version(tmp_path, 'v2.json', params_base, '2.0', intercepto_delta=0.2)
+    assert registro.recargar() is True
+    assert registro.vigente()[0].startswith('2.0+') and registro.vigente()[0] != vigente
+
+
+def test_no_activa_version_menor_salvo_forzada(tmp_path, params_base):
+    _escribir_version(tmp_path, 'v1.json', params_base, '1.0')
+    v2 = _escribir_version(tmp_path, 'v2.json', params_base, '2.0', intercepto_delta=0.1)
+    registro = RegistroParametros(str(tmp_path))
+
+    os.remove(v2)
+    assert registro.recargar() is False
+    assert registro.vigente()[0].startswith('2.0+')
+    assert registro.recargar(forzar=True) is True
+    assert registro.vigente()[0].startswith('1.0+')
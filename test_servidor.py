@@ -0,0 +1,46 @@
+"""
+Pruebas del servidor HTTP de scoring (servidor.py)
+Ejecutar: python -m pytest -q test_servidor.py
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from model import ModeloAnemiaInfantil
+from servidor import ServidorScoring
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+async def _solicitud_cruda(puerto: int, cabecera: bytes):
+    """Envía una solicitud tal cual y retorna (estado, cuerpo JSON)"""
+    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+    escritor.write(cabecera)
+    await escritor.drain()
+    respuesta = await lector.read()
+    escritor.close()
+    encabezados, _, cuerpo = respuesta.partition(b'\r\n\r\n')
+    return int(encabezados.split()[1]), json.loads(cuerpo)
+
+
+@pytest.mark.parametrize('longitud', [b'abc', b'-5', b'1.5'])
+def test_content_length_invalido_responde_400(longitud):
+    async def escenario():
+        servidor = ServidorScoring(ModeloAnemiaInfantil(os.path.join(RAIZ, 'modelo_params.json')))
+        servidor_asyncio = await servidor.iniciar('127.0.0.1', 0)
+        puerto = servidor_asyncio.sockets[0].getsockname()[1]
+        try:
+            resultado = await _solicitud_cruda(
+                puerto, b'POST /predecir HTTP/1.1\r\nContent-Length: ' + longitud + b'\r\n\r\n{}')
+        finally:
+            servidor_asyncio.close()
+            await servidor_asyncio.wait_closed()
+        return resultado, servidor.errores
+
+    (estado, cuerpo), errores = asyncio.run(escenario())
+    assert estado == 400
+    assert cuerpo['error'] == 'Content-Length inválido'
+    assert errores == 1